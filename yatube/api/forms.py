@@ -0,0 +1,14 @@
+from django import forms
+
+from posts.forms import PostForm
+from posts.models import Group
+
+
+class ApiPostForm(PostForm):
+    """Группа в API передаётся слагом, а не первичным ключом."""
+
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+    )
@@ -0,0 +1,39 @@
+"""Строки values() -> словари для JSON без создания объектов моделей."""
+from django.core.files.storage import default_storage
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+    'comments_count',
+)
+COMMENT_FIELDS = ('id', 'post', 'author__username', 'text', 'created')
+GROUP_FIELDS = ('slug', 'title', 'description')
+
+
+def post_data(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def comment_data(row):
+    return {
+        'id': row['id'],
+        'post': row['post'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'created': row['created'],
+    }
+
+
+def group_data(row):
+    return row
+
+
+def follow_data(row):
+    return {'id': row['id'], 'author': row['author__username']}
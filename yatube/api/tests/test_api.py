@@ -0,0 +1,319 @@
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='AuthorTest')
+        cls.reader = User.objects.create(username='ReaderTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_post_list_pages_by_cursor(self):
+        for i in range(4):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        url = reverse('api:post_list')
+        response = self.guest_client.get(url, {'limit': 3})
+        data = response.json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(data['results'][0]['text'], 'Пост 3')
+        self.assertIsNone(data['previous'])
+        second = self.guest_client.get(data['next']).json()
+        self.assertEqual(
+            [post['text'] for post in second['results']],
+            ['Пост 0', 'Тестовый пост'],
+        )
+        self.assertIsNone(second['next'])
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        response = self.guest_client.get(
+            reverse('api:post_list'), {'cursor': 'bnwxLjV8Mw'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()['results']
+        self.assertEqual(results[0]['text'], 'Тестовый пост')
+
+    def test_post_list_filters_by_group(self):
+        Post.objects.create(text='Без группы', author=self.author)
+        response = self.guest_client.get(
+            reverse('api:post_list'), {'group': 'test-slug'}
+        )
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['group'], 'test-slug')
+        self.assertEqual(results[0]['author'], 'AuthorTest')
+
+    def test_unchanged_list_is_not_modified_without_queries(self):
+        url = reverse('api:post_list')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.send(
+            self.author_client, 'patch',
+            reverse('api:post_detail', args=(self.post.pk,)),
+            {'text': 'Новый текст'},
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_comment_changes_list_etag(self):
+        url = reverse('api:post_list')
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 1)
+
+    def test_non_object_json_is_bad_request(self):
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:follow_list'),
+            reverse('api:follow_bulk'),
+            reverse('api:comment_list', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.send(self.reader_client, 'post', url, [])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+
+    def test_invalid_json_is_bad_request(self):
+        response = self.author_client.post(
+            reverse('api:post_list'), '{', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('Неверный JSON'.encode(), response.content)
+
+    def test_form_encoded_put_is_unsupported(self):
+        response = self.author_client.put(
+            reverse('api:post_detail', args=(self.post.pk,)),
+            'text=Правка', content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Тестовый пост')
+
+    def test_other_value_errors_are_not_reported_as_json(self):
+        with mock.patch.object(
+            follows, 'follow_many', side_effect=ValueError
+        ), self.assertRaises(ValueError):
+            self.send(
+                self.reader_client, 'post', reverse('api:follow_bulk'),
+                {'follow': [self.author.username]},
+            )
+
+    def test_create_post(self):
+        url = reverse('api:post_list')
+        data = {'text': 'Пост через API', 'group': 'test-slug'}
+        response = self.send(self.guest_client, 'post', url, data)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.send(self.author_client, 'post', url, data)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.author, self.author)
+        response = self.send(self.author_client, 'post', url, {'text': ''})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+
+    def test_only_author_edits_post(self):
+        url = reverse('api:post_detail', args=(self.post.pk,))
+        response = self.send(
+            self.reader_client, 'patch', url, {'text': 'Чужая правка'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.send(
+            self.author_client, 'patch', url, {'text': 'Правка автора'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['text'], 'Правка автора')
+        self.assertEqual(response.json()['group'], 'test-slug')
+        response = self.guest_client.get(
+            reverse('api:post_detail', args=(0,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments(self):
+        url = reverse('api:comment_list', args=(self.post.pk,))
+        response = self.send(
+            self.reader_client, 'post', url, {'text': 'Комментарий'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], 'ReaderTest')
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response.json()['results'][0]['text'], 'Комментарий'
+        )
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 1)
+
+    def test_follows(self):
+        url = reverse('api:follow_list')
+        self.assertEqual(
+            self.guest_client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        response = self.send(
+            self.reader_client, 'post', url, {'author': 'AuthorTest'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response = self.send(
+            self.reader_client, 'post', url, {'author': 'ReaderTest'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        results = self.reader_client.get(url).json()['results']
+        self.assertEqual([row['author'] for row in results], ['AuthorTest'])
+        feed = self.reader_client.get(reverse('api:feed')).json()
+        self.assertEqual(feed['results'][0]['id'], self.post.pk)
+        delete_url = reverse('api:follow_delete', args=('AuthorTest',))
+        response = self.reader_client.delete(delete_url)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        response = self.reader_client.delete(delete_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_groups(self):
+        response = self.guest_client.get(reverse('api:group_list'))
+        self.assertEqual(response.json()['results'], [{
+            'slug': 'test-slug',
+            'title': 'Тестовая группа',
+            'description': 'Тестовое описание',
+        }])
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='ReaderTest')
+        cls.authors = [
+            User.objects.create(username=f'Author{i}') for i in range(30)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text=f'Пост {author}', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('api:follow_bulk')
+
+    def follow(self, **data):
+        return self.client.post(
+            self.url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_results_per_user(self):
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        response = self.follow(
+            follow=['Author0', 'Author1', 'Author1', 'ReaderTest', 'Nobody']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['follow'], {
+            'Author0': 'already_following',
+            'Author1': 'followed',
+            'ReaderTest': 'self',
+            'Nobody': 'not_found',
+        })
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 2)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[1]).followers_count, 1
+        )
+        response = self.follow(unfollow=['Author1', 'Author2'])
+        self.assertEqual(response.json()['unfollow'], {
+            'Author1': 'unfollowed', 'Author2': 'not_following',
+        })
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['Author0'],
+        )
+
+    def test_empty_lists_are_objects(self):
+        response = self.follow(follow=['Author0'])
+        self.assertEqual(response.json()['unfollow'], {})
+        response = self.follow(unfollow=['Author0'])
+        self.assertEqual(response.json()['follow'], {})
+
+    def test_follow_and_unfollow_share_transaction(self):
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        with mock.patch.object(
+            follows, 'unfollow_many', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.follow(follow=['Author1'], unfollow=['Author0'])
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['Author0'],
+        )
+
+    def test_query_count_does_not_grow_with_authors(self):
+        names = [author.username for author in self.authors]
+        with CaptureQueriesContext(connection) as few:
+            self.follow(follow=names[:3])
+        Follow.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self.follow(follow=names)
+        self.assertEqual(len(many), len(few))
+        feed = self.client.get(reverse('api:feed'), {'limit': 100}).json()
+        self.assertEqual(len(feed['results']), len(self.authors))
+
+    def test_unfollow_query_count_does_not_grow_with_authors(self):
+        names = [author.username for author in self.authors]
+        self.follow(follow=names)
+        with CaptureQueriesContext(connection) as few:
+            self.follow(unfollow=names[:3])
+        with CaptureQueriesContext(connection) as many:
+            self.follow(unfollow=names[3:])
+        self.assertEqual(len(many), len(few))
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[-1]).followers_count, 0
+        )
+        feed = self.client.get(reverse('api:feed')).json()
+        self.assertEqual(feed['results'], [])
+
+    @override_settings(API_MAX_BULK_FOLLOWS=2)
+    def test_limits_and_validation(self):
+        response = self.follow(follow=['Author0', 'Author1', 'Author2'])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.follow(follow='Author0')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = Client().post(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
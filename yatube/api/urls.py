@@ -0,0 +1,25 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/csrf/', views.csrf, name='csrf'),
+    path('v1/posts/', views.post_list, name='post_list'),
+    path('v1/posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'v1/posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
+    path('v1/groups/', views.group_list, name='group_list'),
+    path('v1/follows/', views.follow_list, name='follow_list'),
+    path('v1/follows/bulk/', views.follow_bulk, name='follow_bulk'),
+    path(
+        'v1/follows/<str:username>/',
+        views.follow_delete,
+        name='follow_delete'
+    ),
+    path('v1/feed/', views.feed, name='feed'),
+]
@@ -0,0 +1,408 @@
+"""JSON API лент, постов, комментариев и подписок.
+
+Ответы собираются из values() без создания объектов моделей. ETag
+считается по версиям областей кэша из posts.cache, поэтому повторный
+GET без изменений получает 304, не выполнив ни одного запроса к базе.
+"""
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition, require_http_methods
+
+from core.db import write_transaction
+from core.routers import read_replica
+from posts import cache, follows
+from posts.feed import follow_feed
+from posts.forms import CommentForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CursorPaginator
+
+from . import serializers
+from .forms import ApiPostForm
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def json_error(status, detail, **extra):
+    return json_response(dict(detail=detail, **extra), status=status)
+
+
+class BadRequestData(Exception):
+    """Тело запроса не разобрать: ответить status с текстом detail."""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def unauthorized():
+    return json_error(HTTPStatus.UNAUTHORIZED, 'Требуется авторизация')
+
+
+def api_login_required(view_func):
+    """Как login_required, но вместо редиректа на форму входа — 401."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return unauthorized()
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def login_required_for_writes(view_func):
+    """Читать могут все, писать — только после входа."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') and (
+            not request.user.is_authenticated
+        ):
+            return unauthorized()
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or '{}')
+        except ValueError:
+            # JSONDecodeError или неверная кодировка
+            raise BadRequestData(HTTPStatus.BAD_REQUEST, 'Неверный JSON')
+        if not isinstance(data, dict):
+            raise BadRequestData(
+                HTTPStatus.BAD_REQUEST, 'Ожидался объект JSON'
+            )
+        return data
+    if request.method in ('PUT', 'PATCH'):
+        # Django разбирает формы только в POST
+        raise BadRequestData(
+            HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            f'{request.method} принимает только application/json',
+        )
+    return request.POST
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.PAGE_LIM))
+    except ValueError:
+        return settings.PAGE_LIM
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(
+        f'{request.path}?{params.urlencode()}'
+    )
+
+
+def paginated(request, rows, serialize, **cursor_options):
+    paginator = CursorPaginator(rows, page_size(request), **cursor_options)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    return json_response({
+        'results': [serialize(row) for row in page_obj],
+        'next': page_link(request, paginator.next_cursor),
+        'previous': page_link(request, paginator.previous_cursor),
+    })
+
+
+def form_error(form):
+    return json_error(
+        HTTPStatus.BAD_REQUEST, 'Неверные данные',
+        errors=form.errors.get_json_data(),
+    )
+
+
+def post_response(pk, status=HTTPStatus.OK):
+    row = Post.objects.filter(pk=pk).values(*serializers.POST_FIELDS)
+    return json_response(serializers.post_data(row.get()), status=status)
+
+
+def bad_json(view_func):
+    """Ответ с ошибкой, если request_data не разобрал тело запроса."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except BadRequestData as error:
+            return json_error(error.status, error.detail)
+    return wrapper
+
+
+def post_scopes(request):
+    # В списке есть comments_count, поэтому и версия комментариев
+    scopes = [cache.feed_scope(), cache.comments_scope()]
+    if request.GET.get('group'):
+        scopes.append(cache.group_scope(request.GET['group']))
+    if request.GET.get('author'):
+        scopes.append(cache.author_scope(request.GET['author']))
+    return scopes
+
+
+@require_http_methods(('GET', 'HEAD', 'POST'))
+@read_replica
+@login_required_for_writes
+@condition(etag_func=cache.etag(post_scopes))
+@bad_json
+def post_list(request):
+    if request.method == 'POST':
+        return post_create(request)
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    return paginated(
+        request, posts.values(*serializers.POST_FIELDS),
+        serializers.post_data,
+    )
+
+
+@write_transaction()
+def post_create(request):
+    form = ApiPostForm(request_data(request), files=request.FILES or None)
+    if not form.is_valid():
+        return form_error(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    form.save()
+    return post_response(post.pk, status=HTTPStatus.CREATED)
+
+
+@require_http_methods(('GET', 'HEAD', 'POST', 'PUT', 'PATCH'))
+@read_replica
+@login_required_for_writes
+@condition(etag_func=cache.etag(
+    lambda request, post_id: (
+        cache.post_scope(post_id), cache.feed_scope()
+    )
+))
+@bad_json
+def post_detail(request, post_id):
+    if request.method in ('GET', 'HEAD'):
+        row = Post.objects.filter(pk=post_id).values(
+            *serializers.POST_FIELDS
+        ).first()
+        if row is None:
+            return json_error(HTTPStatus.NOT_FOUND, 'Пост не найден')
+        return json_response(serializers.post_data(row))
+    return post_edit(request, post_id)
+
+
+@write_transaction()
+def post_edit(request, post_id):
+    post = Post.objects.filter(pk=post_id).select_related('group').first()
+    if post is None:
+        return json_error(HTTPStatus.NOT_FOUND, 'Пост не найден')
+    if post.author_id != request.user.pk:
+        return json_error(
+            HTTPStatus.FORBIDDEN, 'Редактировать можно только свои посты'
+        )
+    data = request_data(request)
+    if request.method == 'PATCH':
+        data = dict(
+            {'text': post.text, 'group': post.group and post.group.slug},
+            **data,
+        )
+    form = ApiPostForm(data, files=request.FILES or None, instance=post)
+    if not form.is_valid():
+        return form_error(form)
+    form.save()
+    return post_response(post.pk)
+
+
+@require_http_methods(('GET', 'HEAD'))
+@read_replica
+@condition(etag_func=cache.etag(
+    lambda request: (cache.groups_scope(),)
+))
+def group_list(request):
+    return json_response({'results': [
+        serializers.group_data(row)
+        for row in Group.objects.order_by('title').values(
+            *serializers.GROUP_FIELDS
+        )
+    ]})
+
+
+def comments_modified(request, post_id):
+    return Comment.objects.filter(post_id=post_id).aggregate(
+        last=Max('created')
+    )['last']
+
+
+@require_http_methods(('GET', 'HEAD', 'POST'))
+@read_replica
+@login_required_for_writes
+@condition(
+    etag_func=cache.etag(
+        lambda request, post_id: (cache.post_scope(post_id),)
+    ),
+    last_modified_func=comments_modified,
+)
+@bad_json
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return json_error(HTTPStatus.NOT_FOUND, 'Пост не найден')
+    if request.method == 'POST':
+        return comment_create(request, post_id)
+    return paginated(
+        request,
+        Comment.objects.filter(post_id=post_id).values(
+            *serializers.COMMENT_FIELDS
+        ),
+        serializers.comment_data,
+        field='created',
+    )
+
+
+@write_transaction()
+def comment_create(request, post_id):
+    form = CommentForm(request_data(request))
+    if not form.is_valid():
+        return form_error(form)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post_id = post_id
+    comment.save()
+    row = Comment.objects.filter(pk=comment.pk).values(
+        *serializers.COMMENT_FIELDS
+    ).get()
+    return json_response(
+        serializers.comment_data(row), status=HTTPStatus.CREATED
+    )
+
+
+def user_scopes(request):
+    return (cache.author_scope(request.user.get_username()),)
+
+
+@require_http_methods(('GET', 'HEAD', 'POST'))
+@read_replica
+@api_login_required
+@condition(etag_func=cache.etag(user_scopes, per_session=True))
+@bad_json
+def follow_list(request):
+    if request.method == 'POST':
+        return follow_create(request)
+    response = paginated(
+        request,
+        Follow.objects.filter(user=request.user).order_by('-id').values(
+            'id', 'author__username'
+        ),
+        serializers.follow_data,
+        field='id',
+        tiebreaker='id',
+    )
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@write_transaction()
+def follow_create(request):
+    username = request_data(request).get('author')
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return json_error(HTTPStatus.NOT_FOUND, 'Автор не найден')
+    if author == request.user:
+        return json_error(
+            HTTPStatus.BAD_REQUEST, 'Нельзя подписаться на себя'
+        )
+    follow, created = Follow.objects.get_or_create(
+        user=request.user, author=author
+    )
+    return json_response(
+        serializers.follow_data(
+            {'id': follow.pk, 'author__username': author.username}
+        ),
+        status=HTTPStatus.CREATED if created else HTTPStatus.OK,
+    )
+
+
+def usernames(data, field):
+    if hasattr(data, 'getlist'):
+        return data.getlist(field)
+    names = data.get(field, [])
+    if not isinstance(names, list) or not all(
+        isinstance(name, str) for name in names
+    ):
+        raise ValueError(f'{field} — список имён пользователей')
+    return names
+
+
+@require_http_methods(('POST',))
+@api_login_required
+@bad_json
+def follow_bulk(request):
+    """Подписки и отписки списком: {"follow": [...], "unfollow": [...]}."""
+    data = request_data(request)
+    try:
+        follow = usernames(data, 'follow')
+        unfollow = usernames(data, 'unfollow')
+    except ValueError as error:
+        return json_error(HTTPStatus.BAD_REQUEST, str(error))
+    if len(follow) + len(unfollow) > settings.API_MAX_BULK_FOLLOWS:
+        return json_error(
+            HTTPStatus.BAD_REQUEST,
+            f'Не больше {settings.API_MAX_BULK_FOLLOWS} имён за запрос',
+        )
+    with write_transaction():
+        return json_response({
+            'follow': follows.follow_many(request.user, follow)
+            if follow else {},
+            'unfollow': follows.unfollow_many(request.user, unfollow)
+            if unfollow else {},
+        })
+
+
+@require_http_methods(('DELETE',))
+@api_login_required
+@write_transaction()
+def follow_delete(request, username):
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author__username=username
+    ).delete()
+    if not deleted:
+        return json_error(HTTPStatus.NOT_FOUND, 'Подписки нет')
+    return HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+
+@require_http_methods(('GET', 'HEAD'))
+@read_replica
+@api_login_required
+@condition(etag_func=cache.etag(
+    lambda request: (cache.feed_scope(),) + user_scopes(request),
+    per_session=True,
+))
+def feed(request):
+    response = paginated(
+        request,
+        follow_feed(request.user).values(
+            *serializers.POST_FIELDS, 'feed_date', 'feed_post'
+        ),
+        serializers.post_data,
+        field='feed_date',
+        tiebreaker='feed_post',
+    )
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@require_http_methods(('GET',))
+def csrf(request):
+    """Токен для заголовка X-CSRFToken в запросах на запись."""
+    return json_response({'csrf_token': get_token(request)})
@@ -0,0 +1,18 @@
+"""SQLite с BEGIN IMMEDIATE для транзакций core.db.write_transaction().
+
+Остальные транзакции, в том числе только читающие, начинаются обычным
+BEGIN и не берут блокировку на запись.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        # Так atomic() начинает транзакцию в бэкенде SQLite Django
+        # 2.2–4.2; при обновлении Django проверить, что метод остался.
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
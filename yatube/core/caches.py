@@ -0,0 +1,67 @@
+"""Кэш из переменных окружения и проверка, что он общий для процессов.
+
+В кэше лежат версии областей лент (posts.cache), блокировки пересчёта
+страниц и очередь комментариев. Сбросить версию может любой процесс:
+воркер, manage.py flush_comments, rank_posts, posts_import. Если кэш
+свой у каждого процесса (LocMemCache), остальные об этом не узнают и
+отдают старые страницы до истечения FEED_CACHE_TIMEOUT. Поэтому в
+продакшене нужен общий кэш — memcached или таблица в базе:
+
+    CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+    CACHE_LOCATION=127.0.0.1:11211
+
+    CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+    CACHE_LOCATION=cache_table  # manage.py createcachetable
+
+Без них кэш остаётся в памяти процесса, а страницы лент живут
+не дольше LOCAL_CACHE_MAX_TIMEOUT.
+"""
+import os
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+DATABASE_BACKEND = 'django.core.cache.backends.db.DatabaseCache'
+# Сколько секунд процесс может не видеть изменений из других процессов
+LOCAL_CACHE_MAX_TIMEOUT = 20
+
+
+def cache_settings():
+    backend = os.environ.get('CACHE_BACKEND') or LOCAL_BACKENDS[0]
+    return {
+        'default': {
+            'BACKEND': backend,
+            'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+        },
+    }
+
+
+def is_shared(caches=None):
+    """Видят ли все процессы одни и те же записи кэша по умолчанию."""
+    caches = caches or settings.CACHES
+    return caches['default']['BACKEND'] not in LOCAL_BACKENDS
+
+
+def database_cache_tables(caches=None):
+    caches = caches or settings.CACHES
+    return [
+        options['LOCATION'] for options in caches.values()
+        if options['BACKEND'] == DATABASE_BACKEND
+    ]
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared() or (
+        settings.FEED_CACHE_TIMEOUT <= LOCAL_CACHE_MAX_TIMEOUT
+    ):
+        return []
+    return [Warning(
+        'Кэш в памяти процесса, а страницы лент живут '
+        f'{settings.FEED_CACHE_TIMEOUT} с: изменения из других '
+        'процессов будут видны только после этого срока',
+        hint='Задайте общий кэш через CACHE_BACKEND и CACHE_LOCATION '
+             'или уменьшите FEED_CACHE_TIMEOUT',
+        id='core.W001',
+    )]
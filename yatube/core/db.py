@@ -0,0 +1,93 @@
+"""Настройка соединений с базой: переменные окружения, проверки, SQLite.
+
+database_settings() собирает DATABASES из переменных окружения DB_*.
+Постоянные соединения (CONN_MAX_AGE) перед каждым запросом проверяются
+и закрываются, если сервер их оборвал. Новому соединению SQLite
+выставляются PRAGMA из SQLITE_PRAGMAS, а пишущие транзакции
+write_transaction() начинаются с BEGIN IMMEDIATE (бэкенд
+core.backends.sqlite3): блокировка на запись берётся сразу и ждёт
+busy_timeout, вместо «database is locked» при попытке повысить
+блокировку посреди транзакции.
+"""
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+SQLITE_ENGINE = 'core.backends.sqlite3'
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def database_settings(base_dir):
+    """DATABASES и DATABASE_REPLICAS из окружения.
+
+    DB_REPLICAS — список «имя_базы:вес» через запятую, реплики
+    получают алиасы replica1, replica2 и т. д.
+    """
+    engine = os.environ.get('DB_ENGINE', SQLITE_ENGINE)
+    default = {
+        'ENGINE': engine,
+        'NAME': os.environ.get(
+            'DB_NAME', os.path.join(base_dir, 'db.sqlite3')
+        ),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 60),
+    }
+    databases = {'default': default}
+    replicas = {}
+    spec = os.environ.get('DB_REPLICAS', '')
+    for number, item in enumerate(filter(None, spec.split(',')), 1):
+        name, _, weight = item.strip().rpartition(':')
+        if not name:
+            name, weight = weight, '1'
+        alias = f'replica{number}'
+        # В тестах реплики смотрят в тестовую основную базу
+        databases[alias] = dict(
+            default, NAME=name, TEST={'MIRROR': 'default'}
+        )
+        replicas[alias] = int(weight)
+    return databases, replicas
+
+
+def check_connections(**kwargs):
+    """Перед запросом закрывает оборванные постоянные соединения."""
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """atomic() для транзакций, которые будут писать.
+
+    На SQLite с SQLITE_BEGIN_IMMEDIATE внешняя транзакция начинается
+    с BEGIN IMMEDIATE, на остальных базах это обычный atomic().
+    """
+    connection = connections[using]
+    connection.begin_immediate = settings.SQLITE_BEGIN_IMMEDIATE
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
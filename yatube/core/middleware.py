@@ -0,0 +1,53 @@
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling
+
+logger = logging.getLogger('core.profiling')
+
+
+class ProfilingMiddleware:
+    """Замеряет SQL, шаблоны, кэш и миниатюры каждого запроса.
+
+    Включается настройкой PROFILING_ENABLED. Итоги пишет в заголовок
+    Server-Timing, в гистограмму по представлениям и в лог — для доли
+    запросов PROFILING_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        profiling.instrument_templates()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = profiling.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.sql)
+                    )
+                response = self.get_response(request)
+        finally:
+            profiling.stop()
+        profile.finish()
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        profiling.histogram.record(view, profile)
+        response['Server-Timing'] = profile.server_timing()
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            logger.info(json.dumps(dict(
+                profile.as_dict(),
+                view=view,
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+            ), ensure_ascii=False))
+        return response
@@ -0,0 +1,224 @@
+"""Замеры одного запроса для ProfilingMiddleware.
+
+Пока идёт запрос, в потоке лежит его Profile. Остальной код отмечает
+в нём работу через count() и timer(), а вне запроса эти вызовы ничего
+не делают. Итоги по представлениям копит Histogram в памяти процесса.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.base import Template
+
+# Перцентили в отчётах замеров
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+_original_render = None
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_renders = 0
+        self.template_depth = 0
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+
+    def sql(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} SQL"',
+            f'tpl;dur={self.template_time * 1000:.1f};'
+            f'desc="{self.template_renders} templates"',
+        ]
+        metrics.extend(
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in sorted(self.timings.items())
+        )
+        metrics.extend(
+            f'{name};desc="{total}"'
+            for name, total in sorted(self.counters.items())
+        )
+        metrics.append(f'total;dur={self.duration * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.duration * 1000, 2),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'template_renders': self.template_renders,
+            'timings_ms': {
+                name: round(duration * 1000, 2)
+                for name, duration in self.timings.items()
+            },
+            'counters': dict(self.counters),
+        }
+
+
+def start():
+    _local.profile = Profile()
+    return _local.profile
+
+
+def stop():
+    _local.profile = None
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+def count(name, amount=1):
+    profile = current()
+    if profile is not None:
+        profile.counters[name] += amount
+
+
+@contextmanager
+def timer(name):
+    profile = current()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - started
+
+
+def instrument_templates():
+    """Подменяет Template.render, чтобы считать шаблоны и их время.
+
+    Время берётся только у внешних шаблонов: include внутри цикла
+    увеличивает число отрисовок, но не учитывается дважды.
+    """
+    global _original_render
+    if _original_render is not None:
+        return
+    _original_render = original = Template.render
+
+    def render(self, context):
+        profile = current()
+        if profile is None:
+            return original(self, context)
+        profile.template_renders += 1
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - started
+
+    Template.render = render
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Histogram:
+    """Распределение задержек и средние замеры по представлениям."""
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or settings.PROFILING_BUCKETS)
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, profile):
+        duration = profile.duration * 1000
+        with self.lock:
+            stats = self.views.setdefault(view, {
+                'count': 0,
+                'buckets': [0] * (len(self.buckets) + 1),
+                'duration_ms': 0.0,
+                'queries': 0,
+                'sql_ms': 0.0,
+                'template_ms': 0.0,
+                'counters': defaultdict(int),
+            })
+            stats['count'] += 1
+            index = next(
+                (
+                    number for number, bound in enumerate(self.buckets)
+                    if duration <= bound
+                ),
+                len(self.buckets),
+            )
+            stats['buckets'][index] += 1
+            stats['duration_ms'] += duration
+            stats['queries'] += profile.queries
+            stats['sql_ms'] += profile.sql_time * 1000
+            stats['template_ms'] += profile.template_time * 1000
+            for name, total in profile.counters.items():
+                stats['counters'][name] += total
+
+    def percentile(self, buckets, total, percent):
+        """Верхняя граница корзины, в которую попал перцентиль."""
+        wanted = total * percent / 100
+        seen = 0
+        for bound, hits in zip(self.buckets, buckets):
+            seen += hits
+            if seen >= wanted:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self.lock:
+            views = {
+                view: dict(stats, buckets=list(stats['buckets']),
+                           counters=dict(stats['counters']))
+                for view, stats in self.views.items()
+            }
+        rows = []
+        for view, stats in sorted(views.items()):
+            total = stats['count']
+            rows.append({
+                'view': view,
+                'count': total,
+                'p50_ms': self.percentile(stats['buckets'], total, 50),
+                'p95_ms': self.percentile(stats['buckets'], total, 95),
+                'p99_ms': self.percentile(stats['buckets'], total, 99),
+                'avg_ms': stats['duration_ms'] / total,
+                'avg_queries': stats['queries'] / total,
+                'avg_sql_ms': stats['sql_ms'] / total,
+                'avg_template_ms': stats['template_ms'] / total,
+                'counters': stats['counters'],
+                'buckets': list(zip(
+                    self.buckets + (None,), stats['buckets']
+                )),
+            })
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+histogram = Histogram()
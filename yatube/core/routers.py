@@ -0,0 +1,130 @@
+"""Чтение из реплик для лент, запись — всегда в основную базу.
+
+Реплики перечислены в DATABASE_REPLICAS (алиас из DATABASES -> вес).
+Читают из них только представления с декоратором read_replica, и
+только если пользователь недавно ничего не записывал: после записи
+ReplicaPinningMiddleware на READ_YOUR_WRITES_SECONDS закрепляет его
+сессию за основной базой, чтобы он сразу увидел свой пост или
+комментарий, даже если реплика отстаёт. Записью считается выполненный
+INSERT, UPDATE или DELETE, а не обращение к db_for_write.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caches import database_cache_tables
+
+PIN_SESSION_KEY = '_pin_primary_until'
+WRITE_STATEMENTS = frozenset(('INSERT', 'UPDATE', 'DELETE', 'REPLACE'))
+# Записи сессий и кэша не означают, что пользователь что-то опубликовал
+UNTRACKED_TABLES = (Session._meta.db_table, *database_cache_tables())
+
+_state = threading.local()
+
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+
+def choose_replica():
+    aliases = list(replicas())
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    return random.choices(
+        aliases, weights=[replicas()[alias] for alias in aliases]
+    )[0]
+
+
+def reading_from_replica():
+    return getattr(_state, 'replica', None)
+
+
+@contextmanager
+def primary():
+    """Чтение внутри блока идёт в основную базу."""
+    replica = reading_from_replica()
+    _state.replica = None
+    try:
+        yield
+    finally:
+        _state.replica = replica
+
+
+def read_replica(view_func):
+    """Запросы на чтение внутри представления идут в одну из реплик."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if getattr(_state, 'pinned', False) or request.method not in (
+            'GET', 'HEAD'
+        ):
+            return view_func(request, *args, **kwargs)
+        _state.replica = choose_replica()
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            # Версии в DatabaseCache на отстающей реплике устарели бы
+            return DEFAULT_DB_ALIAS
+        return reading_from_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики приносит репликация
+        if db in replicas():
+            return False
+        return None
+
+
+def track_writes(execute, sql, params, many, context):
+    """execute_wrapper: отмечает запрос, изменивший данные."""
+    words = sql.split(None, 1)
+    if words and words[0].upper() in WRITE_STATEMENTS and not any(
+        table in sql for table in UNTRACKED_TABLES
+    ):
+        _state.wrote = True
+    return execute(sql, params, many, context)
+
+
+class ReplicaPinningMiddleware:
+    """Read-your-writes: после записи сессия читает из основной базы."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        _state.pinned = bool(
+            session and session.get(PIN_SESSION_KEY, 0) > time.time()
+        )
+        _state.wrote = False
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(
+                track_writes
+            ):
+                response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.pinned = _state.wrote = False
+        if wrote and session is not None and replicas():
+            session[PIN_SESSION_KEY] = (
+                time.time() + settings.READ_YOUR_WRITES_SECONDS
+            )
+        return response
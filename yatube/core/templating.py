@@ -0,0 +1,141 @@
+"""Кэш шаблонов и проверка их синтаксиса.
+
+При TEMPLATES_CACHED шаблоны грузит cached.Loader: каждый шаблон
+разбирается один раз на процесс, а не при каждом рендере. warm_up()
+вызывается из wsgi.py при старте воркера и заранее разбирает все
+шаблоны из TEMPLATES['DIRS'], чтобы первые запросы не платили за
+разбор base.html и include-шаблонов.
+
+Проверка core.E001 (manage.py check и запуск тестов) компилирует те
+же шаблоны и падает на синтаксической ошибке до выкладки.
+
+benchmark() сравнивает рендер шаблона с cached.Loader и без него
+(manage.py benchmark_templates).
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.template import (Engine, Origin, RequestContext, Template,
+                             TemplateSyntaxError)
+from django.template.backends.django import get_installed_libraries
+from django.template.loaders.cached import Loader as CachedLoader
+
+from .profiling import PERCENTILES, percentile
+
+logger = logging.getLogger(__name__)
+
+
+def project_templates(engine):
+    """Пары (путь, имя) всех файлов в каталогах DIRS."""
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, '/')
+                yield path, name
+
+
+def is_cached(engine):
+    return any(
+        isinstance(loader, CachedLoader) for loader in engine.template_loaders
+    )
+
+
+def load_templates(engine):
+    """Загружает все шаблоны проекта, возвращает их число."""
+    total = 0
+    for _, name in project_templates(engine):
+        engine.get_template(name)
+        total += 1
+    return total
+
+
+def warm_up(engine=None):
+    """Разбирает шаблоны проекта в кэш загрузчика, возвращает их число."""
+    engine = engine or Engine.get_default()
+    if not settings.TEMPLATES_WARMUP or not is_cached(engine):
+        return 0
+    started = time.perf_counter()
+    total = load_templates(engine)
+    logger.info(
+        'Разобрано шаблонов: %s за %.1f мс',
+        total, (time.perf_counter() - started) * 1000,
+    )
+    return total
+
+
+@register(Tags.templates)
+def check_template_syntax(app_configs, **kwargs):
+    engine = Engine.get_default()
+    errors = []
+    for path, name in project_templates(engine):
+        with open(path, encoding=engine.file_charset) as source:
+            text = source.read()
+        try:
+            Template(text, Origin(path, name), name, engine)
+        except TemplateSyntaxError as error:
+            errors.append(Error(
+                f'Синтаксическая ошибка в шаблоне {name}: {error}',
+                obj=path,
+                id='core.E001',
+            ))
+    return errors
+
+
+def build_engine(cached):
+    """Движок с настройками проекта, с cached.Loader или без него."""
+    options = settings.TEMPLATES[0]
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(
+        dirs=options['DIRS'],
+        context_processors=options['OPTIONS'].get(
+            'context_processors', []
+        ),
+        debug=settings.DEBUG,
+        loaders=loaders,
+        libraries=get_installed_libraries(),
+    )
+
+
+def benchmark(name, context, request, renders=200, warmup=3):
+    """Рендер name без кэша шаблонов, с кэшем и первый рендер, мс.
+
+    Контекст готовит вызывающий код, поэтому в замер входят только
+    загрузка, разбор и рендер шаблонов.
+    """
+    def render(engine):
+        started = time.perf_counter()
+        engine.get_template(name).render(RequestContext(request, context))
+        return (time.perf_counter() - started) * 1000
+
+    results = {}
+    for label, cached in (('uncached', False), ('cached', True)):
+        engine = build_engine(cached)
+        first = render(engine)
+        for _ in range(warmup):
+            render(engine)
+        timings = [render(engine) for _ in range(renders)]
+        results[label] = dict(
+            first_ms=round(first, 2),
+            **{
+                f'p{percent}_ms': round(percentile(timings, percent), 2)
+                for percent in PERCENTILES
+            },
+        )
+    engine = build_engine(cached=True)
+    started = time.perf_counter()
+    templates = load_templates(engine)
+    results['warmup'] = {
+        'templates': templates,
+        'warmup_ms': round((time.perf_counter() - started) * 1000, 2),
+        'first_ms': round(render(engine), 2),
+    }
+    return results
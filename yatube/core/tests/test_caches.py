@@ -0,0 +1,45 @@
+import os
+from unittest import mock
+
+from django.core.cache.backends.db import DatabaseCache
+from django.test import SimpleTestCase, override_settings
+
+from core import routers
+from core.caches import (DATABASE_BACKEND, LOCAL_CACHE_MAX_TIMEOUT,
+                         cache_settings, check_shared_cache, is_shared)
+
+LOCAL = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+SHARED = {'default': {'BACKEND': DATABASE_BACKEND, 'LOCATION': 'cache'}}
+
+
+class SharedCacheTests(SimpleTestCase):
+    def test_settings_from_environment(self):
+        with mock.patch.dict(os.environ, {
+            'CACHE_BACKEND': DATABASE_BACKEND, 'CACHE_LOCATION': 'cache',
+        }):
+            caches = cache_settings()
+        self.assertEqual(caches, SHARED)
+        self.assertTrue(is_shared(caches))
+        with mock.patch.dict(os.environ, {'CACHE_BACKEND': ''}):
+            self.assertFalse(is_shared(cache_settings()))
+
+    def test_check_warns_about_long_local_cache(self):
+        with override_settings(CACHES=LOCAL, FEED_CACHE_TIMEOUT=60 * 60):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.W001'])
+        with override_settings(
+            CACHES=LOCAL, FEED_CACHE_TIMEOUT=LOCAL_CACHE_MAX_TIMEOUT
+        ):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=SHARED, FEED_CACHE_TIMEOUT=60 * 60):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_database_cache_is_read_from_primary(self):
+        model = DatabaseCache('cache', {}).cache_model_class
+        with mock.patch.object(
+            routers, 'reading_from_replica', return_value='replica1'
+        ):
+            router = routers.ReplicaRouter()
+            self.assertEqual(router.db_for_read(model), 'default')
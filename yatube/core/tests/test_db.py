@@ -0,0 +1,89 @@
+import os
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+
+from core import db
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_defaults_to_sqlite_with_persistent_connections(self):
+        with mock.patch.dict(os.environ, clear=True):
+            databases, replicas = db.database_settings('/srv')
+        self.assertEqual(databases['default']['NAME'], '/srv/db.sqlite3')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(replicas, {})
+
+    def test_reads_engine_and_replicas_from_environment(self):
+        environ = {
+            'DB_ENGINE': 'django.db.backends.postgresql',
+            'DB_NAME': 'yatube',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '0',
+            'DB_REPLICAS': 'yatube_r1:3, yatube_r2',
+        }
+        with mock.patch.dict(os.environ, environ, clear=True):
+            databases, replicas = db.database_settings('/srv')
+        self.assertEqual(databases['default']['HOST'], 'db')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(databases['replica1']['NAME'], 'yatube_r1')
+        self.assertEqual(databases['replica2']['HOST'], 'db')
+        self.assertEqual(replicas, {'replica1': 3, 'replica2': 1})
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=True)
+    def test_broken_connections_are_closed_before_request(self):
+        alive, broken, busy = (
+            mock.Mock(in_atomic_block=False),
+            mock.Mock(in_atomic_block=False),
+            mock.Mock(in_atomic_block=True),
+        )
+        alive.is_usable.return_value = True
+        broken.is_usable.return_value = False
+        busy.is_usable.return_value = False
+        with mock.patch.object(
+            db.connections, 'all', return_value=[alive, broken, busy]
+        ):
+            db.check_connections()
+        alive.close.assert_not_called()
+        broken.close.assert_called_once_with()
+        busy.close.assert_not_called()
+
+
+class SqlitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+
+class WriteTransactionTests(TransactionTestCase):
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            with block:
+                connection.cursor().execute('SELECT 1')
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('BEGIN')
+        ]
+
+    def test_only_write_transactions_begin_immediate(self):
+        self.assertEqual(
+            self.begins(db.write_transaction()), ['BEGIN IMMEDIATE']
+        )
+        self.assertEqual(self.begins(transaction.atomic()), ['BEGIN'])
+        with override_settings(SQLITE_BEGIN_IMMEDIATE=False):
+            self.assertEqual(self.begins(db.write_transaction()), ['BEGIN'])
+
+    def test_nested_write_transaction_is_savepoint(self):
+        with transaction.atomic():
+            with db.write_transaction():
+                self.assertFalse(connection.begin_immediate)
+        self.assertFalse(connection.begin_immediate)
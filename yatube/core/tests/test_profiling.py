@@ -0,0 +1,70 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import histogram
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        histogram.reset()
+        self.guest_client = Client()
+
+    def timings(self, response):
+        return dict(
+            metric.split(';', 1)
+            for metric in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_reports_sql_templates_and_cache(self):
+        first = self.timings(self.guest_client.get(reverse('posts:index')))
+        self.assertIn('SQL', first['db'])
+        self.assertNotIn('desc="0 templates"', first['tpl'])
+        self.assertIn('cache_miss', first)
+        second = self.timings(self.guest_client.get(reverse('posts:index')))
+        self.assertIn('cache_hit', second)
+        self.assertIn('desc="0 templates"', second['tpl'])
+
+    def test_histogram_is_shown_to_staff_only(self):
+        self.guest_client.get(reverse('posts:index'))
+        url = reverse('core:profiling')
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        response = staff_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        rows = {row['view']: row for row in response.context['views']}
+        self.assertEqual(rows['posts:index']['count'], 1)
+        self.assertContains(response, 'posts:index')
+        staff_client.post(url)
+        self.assertNotIn(
+            'posts:index', {row['view'] for row in histogram.snapshot()}
+        )
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests_are_logged_as_json(self):
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.guest_client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], HTTPStatus.OK)
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_setting(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
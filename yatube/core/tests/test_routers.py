@@ -0,0 +1,151 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import routers
+from posts.models import Post, UserStats
+
+User = get_user_model()
+REPLICAS = ('replica1', 'replica2')
+
+
+class ReplicaRouterTests(TestCase):
+    """Реплики — файлы SQLite, скопированные из тестовой базы."""
+
+    databases = {'default', *REPLICAS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        connections['default'].ensure_connection()
+        for alias in REPLICAS:
+            name = os.path.join(cls.temp_dir, f'{alias}.sqlite3')
+            target = sqlite3.connect(name)
+            connections['default'].connection.backup(target)
+            target.close()
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': name,
+            }
+            connections.ensure_defaults(alias)
+            connections.prepare_test_settings(alias)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections.databases[alias]
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='writer')
+        # bulk_create не вызывает сигналы, как и настоящая репликация
+        for alias in REPLICAS:
+            User.objects.using(alias).bulk_create(
+                [User(pk=self.user.pk, username='writer')]
+            )
+            UserStats.objects.using(alias).bulk_create(
+                [UserStats(user_id=self.user.pk, posts_count=1)]
+            )
+            Post.objects.using(alias).bulk_create(
+                [Post(text=f'Пост из {alias}', author_id=self.user.pk)]
+            )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(DATABASE_REPLICAS={'replica1': 1, 'replica2': 0})
+    def test_feed_views_read_from_replica(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:follow_index'),
+        )
+        for url in pages[:2]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    Client().get(url), 'Пост из replica1'
+                )
+        self.assertEqual(
+            self.client.get(pages[2]).status_code, 200
+        )
+
+    @override_settings(DATABASE_REPLICAS={'replica1': 1, 'replica2': 0})
+    def test_reads_stay_on_primary_after_write(self):
+        url = reverse('posts:index')
+        self.assertContains(self.client.get(url), 'Пост из replica1')
+        self.client.post(reverse('posts:post_create'), {'text': 'Свежий'})
+        response = self.client.get(url)
+        self.assertContains(response, 'Свежий')
+        self.assertNotContains(response, 'Пост из replica1')
+        with mock.patch.object(
+            routers.time, 'time',
+            return_value=routers.time.time() + 3600,
+        ):
+            cache.clear()
+            self.assertContains(self.client.get(url), 'Пост из replica1')
+
+    @override_settings(DATABASE_REPLICAS={'replica1': 1, 'replica2': 0})
+    def test_only_real_writes_pin_session(self):
+        factory = RequestFactory()
+
+        def pinned(view):
+            request = factory.get('/')
+            request.session = {}
+            routers.ReplicaPinningMiddleware(view)(request)
+            return routers.PIN_SESSION_KEY in request.session
+
+        def read_for_write(request):
+            User.objects.get_or_create(username='writer')
+            return HttpResponse()
+
+        def write(request):
+            User.objects.create(username='new')
+            return HttpResponse()
+
+        self.assertFalse(pinned(read_for_write))
+        self.assertTrue(pinned(write))
+
+    @override_settings(DATABASE_REPLICAS={'replica1': 1, 'replica2': 0})
+    def test_recently_changed_pages_read_primary(self):
+        url = reverse('posts:index')
+        Post.objects.create(text='Только что', author=self.user)
+        response = Client().get(url)
+        self.assertContains(response, 'Только что')
+        self.assertNotContains(response, 'Пост из replica1')
+        cache.clear()
+        self.assertContains(Client().get(url), 'Пост из replica1')
+
+    @override_settings(DATABASE_REPLICAS={})
+    def test_without_replicas_everything_reads_primary(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Пост из')
+
+    @override_settings(DATABASE_REPLICAS={'replica1': 3, 'replica2': 1})
+    def test_replicas_are_chosen_by_weight(self):
+        with mock.patch.object(routers.random, 'choices') as choices:
+            choices.return_value = ['replica2']
+            self.assertEqual(routers.choose_replica(), 'replica2')
+        choices.assert_called_once_with(
+            ['replica1', 'replica2'], weights=[3, 1]
+        )
+        self.assertFalse(routers.ReplicaRouter().allow_migrate(
+            'replica1', 'posts'
+        ))
+        self.assertEqual(
+            routers.ReplicaRouter().db_for_read(Post), 'default'
+        )
@@ -0,0 +1,81 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.template import Context, Engine
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.templating import benchmark, check_template_syntax, warm_up
+
+
+def templates(dirs, cached):
+    loaders = ['django.template.loaders.filesystem.Loader']
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': dirs,
+        'OPTIONS': {'loaders': loaders},
+    }]
+
+
+class TemplatingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        os.makedirs(os.path.join(self.dir, 'posts'))
+        self.write('base.html', '{% block content %}{% endblock %}')
+        self.write(
+            'posts/index.html',
+            "{% extends 'base.html' %}{% block content %}ok{% endblock %}",
+        )
+
+    def write(self, name, text):
+        with open(os.path.join(self.dir, name), 'w') as template:
+            template.write(text)
+
+    def test_warm_up_fills_cached_loader(self):
+        with override_settings(TEMPLATES=templates([self.dir], True)):
+            engine = Engine.get_default()
+            self.assertEqual(warm_up(), 2)
+            loader = engine.template_loaders[0]
+            self.assertIn('posts/index.html', loader.get_template_cache)
+            self.assertEqual(
+                engine.get_template('posts/index.html').render(Context()),
+                'ok',
+            )
+
+    def test_warm_up_skips_uncached_engine(self):
+        with override_settings(TEMPLATES=templates([self.dir], False)):
+            self.assertEqual(warm_up(), 0)
+        with override_settings(
+            TEMPLATES=templates([self.dir], True), TEMPLATES_WARMUP=False
+        ):
+            self.assertEqual(warm_up(), 0)
+
+    def test_check_reports_syntax_errors(self):
+        with override_settings(TEMPLATES=templates([self.dir], True)):
+            self.assertEqual(check_template_syntax(None), [])
+            self.write('posts/broken.html', '{% if %}{% endfor %}')
+            errors = check_template_syntax(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIn('posts/broken.html', errors[0].msg)
+
+    def test_benchmark_compares_loaders(self):
+        with override_settings(TEMPLATES=templates([self.dir], True)):
+            results = benchmark(
+                'posts/index.html', {}, RequestFactory().get('/'),
+                renders=5, warmup=1,
+            )
+        self.assertEqual(set(results), {'uncached', 'cached', 'warmup'})
+        self.assertEqual(
+            set(results['cached']),
+            {'first_ms', 'p50_ms', 'p95_ms', 'p99_ms'},
+        )
+        self.assertEqual(results['warmup']['templates'], 2)
+
+    def test_project_templates_pass_check(self):
+        call_command('check', stdout=StringIO())
+        self.assertEqual(check_template_syntax(None), [])
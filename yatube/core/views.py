@@ -1,6 +1,10 @@
 from http import HTTPStatus
 
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+
+from .profiling import histogram
 
 
 def page_not_found(request, exception):
@@ -13,3 +17,14 @@ def csrf_failure(request, reason=''):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+@staff_member_required
+def profiling_report(request):
+    if request.method == 'POST':
+        histogram.reset()
+        return redirect('core:profiling')
+    return render(request, 'core/profiling.html', {
+        'views': histogram.snapshot(),
+        'enabled': settings.PROFILING_ENABLED,
+    })
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import comment_queue, signals  # noqa: F401
+        from .thumbnails import register_formats
+        register_formats()
@@ -0,0 +1,418 @@
+"""Кэш страниц лент с версиями, которые сбрасываются событиями.
+
+Каждая лента зависит от одной или нескольких областей (scope):
+вся лента, группа, автор, пост. В ключ кэша входят текущие версии
+этих областей, поэтому страницы живут часами, а сигналы об изменении
+данных просто увеличивают версию — старые ключи больше не читаются
+и вытесняются по таймауту.
+
+От «лавины» пересчётов страница защищена так: запись хранится дольше
+своего срока (stale_timeout), пересчитывает её только воркер, взявший
+короткую блокировку, а остальные тем временем получают старую копию.
+Пересчёт может начаться и раньше срока — с вероятностью, растущей
+к его концу (beta > 0, алгоритм XFetch).
+"""
+import hashlib
+import math
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (get_cache_key, learn_cache_key,
+                                patch_vary_headers)
+
+from core import profiling, routers
+
+VERSION_KEY = 'version:{}'
+BUMPED_KEY = 'bumped:{}'
+CHANGED_KEY = 'changed:{}'
+LOCK_KEY = '{}.lock.{}'
+PENDING_KEY = 'comments.pending.{}.{}'
+CARD_KEY = 'post_card.{}.{}'
+# Увеличить при изменении includes/post_author.html
+CARD_VERSION = 1
+
+
+def feed_scope():
+    return 'feed'
+
+
+def ranking_scope():
+    return 'ranking'
+
+
+def comments_scope():
+    """Любой новый или удалённый комментарий: числа в списках постов."""
+    return 'comments'
+
+
+def groups_scope():
+    return 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post):
+    scopes = [
+        feed_scope(),
+        post_scope(post.pk),
+        author_scope(post.author.username),
+    ]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    return scopes
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начальная версия из времени: после вытеснения ключа
+            # версии не повторяются и старые страницы не оживают.
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def version_key(scope):
+    # Слаги и имена могут быть не ASCII, а memcached принимает только его
+    return VERSION_KEY.format(quote(scope))
+
+
+def bump(*scopes):
+    """Увеличивает версии областей.
+
+    Внутри транзакции версии увеличиваются ещё раз после коммита:
+    страница, собранная между первым увеличением и коммитом из старых
+    данных, попала бы в кэш под новой версией.
+    """
+    increment(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: increment(scopes))
+
+
+def increment(scopes):
+    for scope in scopes:
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+    now = time.time()
+    cache.set_many({changed_key(scope): now for scope in scopes}, None)
+    if routers.replicas():
+        # Ключ живёт, пока реплики могут не видеть изменение
+        cache.set_many(
+            {bumped_key(scope): 1 for scope in scopes},
+            settings.REPLICA_LAG_SECONDS,
+        )
+
+
+def changed_key(scope):
+    return CHANGED_KEY.format(quote(scope))
+
+
+def last_changed(scopes):
+    """Время последнего сброса любой из областей, для Last-Modified.
+
+    Неизвестное время (ключ вытеснен) считается текущим: лишний
+    ответ 200 лучше, чем 304 со старой страницей.
+    """
+    keys = [changed_key(scope) for scope in scopes]
+    times = cache.get_many(keys)
+    for key in keys:
+        if key not in times:
+            cache.add(key, time.time(), None)
+            times[key] = cache.get(key, time.time())
+    if not times:
+        return None
+    return datetime.fromtimestamp(max(times.values()), timezone.utc)
+
+
+def bumped_key(scope):
+    return BUMPED_KEY.format(quote(scope))
+
+
+def recently_bumped(scopes):
+    """Менялись ли области за последние REPLICA_LAG_SECONDS."""
+    return bool(cache.get_many([bumped_key(scope) for scope in scopes]))
+
+
+def pending_comments(post_id, author_id):
+    """Комментарии автора из очереди, ещё не записанные в базу."""
+    return cache.get(PENDING_KEY.format(post_id, author_id), [])
+
+
+@contextmanager
+def locked(key):
+    """Короткая блокировка на ключ для чтения и записи списка в кэше."""
+    lock = LOCK_KEY.format(key, 'update')
+    # Блокировка живёт не дольше FEED_CACHE_LOCK_TIMEOUT, так что
+    # ожидание конечно даже после падения её владельца.
+    while not cache.add(lock, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        time.sleep(settings.FEED_CACHE_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        cache.delete(lock)
+
+
+def add_pending(record):
+    key = PENDING_KEY.format(record['post'], record['author'])
+    with locked(key):
+        cache.set(
+            key, cache.get(key, []) + [record],
+            settings.COMMENT_PENDING_TIMEOUT,
+        )
+
+
+def drop_pending(records):
+    keys = defaultdict(set)
+    for record in records:
+        keys[PENDING_KEY.format(record['post'], record['author'])].add(
+            record['key']
+        )
+    for key, flushed in keys.items():
+        with locked(key):
+            left = [
+                record for record in cache.get(key, [])
+                if record['key'] not in flushed
+            ]
+            if left:
+                cache.set(key, left, settings.COMMENT_PENDING_TIMEOUT)
+            else:
+                cache.delete(key)
+
+
+def card_key(post):
+    """Ключ карточки поста: меняется при правке поста и смене имени
+    автора или названия группы, поэтому явно карточки не удаляются."""
+    group = post.group
+    parts = (
+        CARD_VERSION, post.updated_at.timestamp(), post.author.username,
+        post.author.get_full_name(), group and group.slug,
+        group and group.title,
+    )
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return CARD_KEY.format(post.pk, digest)
+
+
+def get_cards(posts):
+    """{pk: html} карточек из кэша одним get_many."""
+    keys = {card_key(post): post.pk for post in posts}
+    return {
+        keys[key]: html for key, html in cache.get_many(list(keys)).items()
+    }
+
+
+def set_cards(cards):
+    """cards: {post: html}."""
+    cache.set_many(
+        {card_key(post): html for post, html in cards.items()},
+        settings.POST_CARD_CACHE_TIMEOUT,
+    )
+
+
+def etag(scopes, per_session=False):
+    """etag_func для condition: хэш версий областей ответа.
+
+    Версии лежат в кэше, поэтому для 304 не нужен ни один запрос
+    к базе. Страницы, зависящие от пользователя, различаются по ключу
+    сессии: он берётся из cookie без загрузки сессии и пользователя.
+    """
+    def etag_func(request, *args, **kwargs):
+        parts = get_versions(scopes(request, *args, **kwargs))
+        if per_session:
+            parts.append(request.COOKIES.get(
+                settings.SESSION_COOKIE_NAME, ''
+            ))
+        return hashlib.md5('.'.join(parts).encode()).hexdigest()
+    return etag_func
+
+
+def versioned_prefix(scopes):
+    return 'feed_page.' + '.'.join(get_versions(scopes))
+
+
+def should_refresh(expires, delta, beta, now):
+    if now >= expires:
+        return True
+    if not beta:
+        return False
+    return now - delta * beta * math.log(1 - random.random()) >= expires
+
+
+def lock_key(request, key_prefix):
+    """Блокировка на тот же ключ, под которым ляжет запись.
+
+    Пока заголовки Vary для адреса не выучены, ключ собирается из
+    адреса и Cookie: cache_feed всегда варьирует ответ по Cookie.
+    """
+    cache_key = get_cache_key(request, key_prefix, 'GET', cache)
+    if cache_key is None:
+        cache_key = request.build_absolute_uri() + request.META.get(
+            'HTTP_COOKIE', ''
+        )
+    digest = hashlib.md5(cache_key.encode()).hexdigest()
+    return LOCK_KEY.format(key_prefix, digest)
+
+
+def cached_entry(request, key_prefix):
+    cache_key = get_cache_key(request, key_prefix, 'GET', cache)
+    if cache_key is None:
+        return None
+    return cache.get(cache_key)
+
+
+def wait_for_entry(request, key_prefix, lock):
+    """Ждёт запись, пока другой воркер держит блокировку."""
+    deadline = time.time() + settings.FEED_CACHE_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(settings.FEED_CACHE_POLL_INTERVAL)
+        entry = cached_entry(request, key_prefix)
+        if entry is not None or cache.get(lock) is None:
+            return entry
+    return None
+
+
+def fresh_response(entry, beta):
+    """Ответ из записи, если её ещё рано пересчитывать."""
+    if entry is None:
+        return None
+    response, expires, delta = entry
+    if should_refresh(expires, delta, beta, time.time()):
+        return None
+    return response
+
+
+def take_lock(lock):
+    return cache.add(lock, 1, settings.FEED_CACHE_LOCK_TIMEOUT)
+
+
+def stale_response(request, key_prefix, entry, lock):
+    """Старая копия, пока страницу пересчитывает другой воркер."""
+    if entry is None:
+        entry = wait_for_entry(request, key_prefix, lock)
+    if entry is None:
+        return None
+    return entry[0]
+
+
+def refresh_lock(request, key_prefix, entry):
+    """Блокировка на пересчёт страницы или её старая копия.
+
+    Возвращает (lock, response): ключ взятой блокировки либо ответ,
+    который можно отдать, пока пересчитывает другой воркер. Оба None —
+    страницу нужно собрать без записи в кэш.
+    """
+    lock = lock_key(request, key_prefix)
+    if take_lock(lock):
+        return lock, None
+    response = stale_response(request, key_prefix, entry, lock)
+    if response is not None:
+        return None, response
+    # Блокировку сняли без записи: пробуем пересчитать сами
+    if take_lock(lock):
+        return lock, None
+    return None, None
+
+
+def store(request, response, key_prefix, timeout, stale_timeout, started):
+    """Кладёт ответ в кэш со сроком timeout и запасом stale_timeout."""
+    if response.status_code != 200 or response.streaming:
+        return
+    patch_vary_headers(response, ('Cookie',))
+    cache_key = learn_cache_key(
+        request, response, timeout + stale_timeout, key_prefix, cache
+    )
+    finished = time.time()
+    cache.set(
+        cache_key,
+        (response, finished + timeout, finished - started),
+        timeout + stale_timeout,
+    )
+
+
+@contextmanager
+def fresh_reads(scopes):
+    """Пересчёт читает из основной базы, если реплика может отставать.
+
+    Версия области сменилась недавно: реплика может ещё не видеть
+    изменение, и старые данные легли бы в кэш под новой версией.
+    """
+    if routers.reading_from_replica() and recently_bumped(scopes):
+        with routers.primary():
+            yield
+    else:
+        yield
+
+
+def cache_feed(scopes, timeout=None, stale_timeout=None, beta=None):
+    """Замена cache_page для лент.
+
+    scopes(request, *args, **kwargs) возвращает области, от которых
+    зависит страница. Ответ кэшируется с учётом cookie, как и у
+    cache_page, но ключ меняется, как только меняется версия любой
+    из областей. Просроченную страницу пересчитывает один воркер —
+    среди всех процессов, только если кэш общий (core/caches.py).
+    """
+    timeout = settings.FEED_CACHE_TIMEOUT if timeout is None else timeout
+    stale_timeout = (
+        settings.FEED_CACHE_STALE_TIMEOUT if stale_timeout is None
+        else stale_timeout
+    )
+    beta = settings.FEED_CACHE_EARLY_BETA if beta is None else beta
+
+    def decorator(view_func):
+        def regenerate(request, key_prefix, *args, **kwargs):
+            started = time.time()
+            response = view_func(request, *args, **kwargs)
+            store(
+                request, response, key_prefix, timeout, stale_timeout,
+                started,
+            )
+            return response
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            scope_list = scopes(request, *args, **kwargs)
+            key_prefix = versioned_prefix(scope_list)
+            entry = cached_entry(request, key_prefix)
+            response = fresh_response(entry, beta)
+            if response is not None:
+                profiling.count('cache_hit')
+                return response
+            lock, response = refresh_lock(request, key_prefix, entry)
+            if response is not None:
+                profiling.count('cache_stale')
+                return response
+            profiling.count('cache_miss')
+            if lock is None:
+                return view_func(request, *args, **kwargs)
+            try:
+                with fresh_reads(scope_list):
+                    return regenerate(request, key_prefix, *args, **kwargs)
+            finally:
+                cache.delete(lock)
+        return wrapper
+    return decorator
@@ -0,0 +1,198 @@
+"""Отложенная запись комментариев (COMMENT_QUEUE_ENABLED).
+
+add_comment не вставляет строку в базу, а дописывает комментарий
+строкой JSON в файл очереди в COMMENT_QUEUE_DIR — одним write() с
+O_APPEND, с fsync при COMMENT_QUEUE_FSYNC. Пока комментарий ждёт
+записи, автор видит его под постом из кэша (cache.pending_comments).
+
+manage.py flush_comments под исключительной блокировкой переименовывает
+файл очереди — писатели держат разделяемую, поэтому ни одна строка не
+попадёт в уже забранный файл, — и записывает его пачками bulk_create.
+Сигналы при этом не срабатывают: счётчики и версии кэша обновляются
+здесь же. Дата комментария берётся из очереди, и по паре (автор, дата)
+повторный разбор файла после сбоя не создаёт дублей. Пачка, которую
+база не приняла, откладывается в файл .failed и не держит очередь.
+
+flush_comments работает в отдельном процессе, и его сброс версий и
+список ожидающих комментариев должны дойти до воркеров, поэтому
+очередь требует общего кэша (core/caches.py, проверка posts.E001).
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.checks import Error, register
+from django.db import DatabaseError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import caches
+from core.db import write_transaction
+
+from . import cache, counters
+from .models import Comment, Post, User
+from .transfer import keep_dates
+
+QUEUE_NAME = 'comments.ndjson'
+LOCK_NAME = 'comments.lock'
+FLUSHING_SUFFIX = '.flushing'
+FAILED_SUFFIX = '.failed'
+
+logger = logging.getLogger(__name__)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if not settings.COMMENT_QUEUE_ENABLED or caches.is_shared():
+        return []
+    return [Error(
+        'Очередь комментариев включена, а кэш свой у каждого процесса: '
+        'комментарии из flush_comments не появятся на страницах '
+        'воркеров, а у автора останутся дубли из очереди',
+        hint='Задайте общий кэш через CACHE_BACKEND и CACHE_LOCATION',
+        id='posts.E001',
+    )]
+
+
+def queue_path(name=QUEUE_NAME):
+    return os.path.join(settings.COMMENT_QUEUE_DIR, name)
+
+
+@contextmanager
+def locked(operation):
+    os.makedirs(settings.COMMENT_QUEUE_DIR, exist_ok=True)
+    with open(queue_path(LOCK_NAME), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def enqueue(post_id, author_id, text):
+    record = {
+        'key': uuid.uuid4().hex,
+        'post': post_id,
+        'author': author_id,
+        'text': text,
+        'created': timezone.now().isoformat(),
+    }
+    line = (json.dumps(record, ensure_ascii=False) + '\n').encode()
+    with locked(fcntl.LOCK_SH):
+        fd = os.open(
+            queue_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+        try:
+            os.write(fd, line)
+            if settings.COMMENT_QUEUE_FSYNC:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+    cache.add_pending(record)
+    cache.bump(cache.post_scope(post_id))
+    return record
+
+
+def rotate():
+    """Забирает текущий файл очереди, писатели начнут новый."""
+    with locked(fcntl.LOCK_EX):
+        path = queue_path()
+        if os.path.exists(path) and os.path.getsize(path):
+            os.rename(path, f'{path}.{time.time_ns()}{FLUSHING_SUFFIX}')
+    return sorted(glob.glob(queue_path(f'{QUEUE_NAME}.*{FLUSHING_SUFFIX}')))
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as source:
+        for number, line in enumerate(source, 1):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Недописанная строка после сбоя сервера
+                logger.warning('Пропущена строка %s в %s', number, path)
+
+
+def save_batch(records):
+    posts = set(Post.objects.filter(
+        pk__in={record['post'] for record in records}
+    ).values_list('pk', flat=True))
+    authors = set(User.objects.filter(
+        pk__in={record['author'] for record in records}
+    ).values_list('pk', flat=True))
+    comments = [
+        Comment(
+            post_id=record['post'], author_id=record['author'],
+            text=record['text'], created=parse_datetime(record['created']),
+        )
+        for record in records
+        if record['post'] in posts and record['author'] in authors
+    ]
+    saved = set(Comment.objects.filter(
+        author_id__in={comment.author_id for comment in comments},
+        created__in={comment.created for comment in comments},
+    ).values_list('author_id', 'created'))
+    comments = [
+        comment for comment in comments
+        if (comment.author_id, comment.created) not in saved
+    ]
+    with write_transaction(), keep_dates():
+        Comment.objects.bulk_create(comments)
+        commented = Counter(comment.post_id for comment in comments)
+        for post, total in commented.items():
+            counters.change_comments(post, total)
+    if commented:
+        cache.bump(
+            cache.comments_scope(),
+            *(cache.post_scope(post) for post in commented),
+        )
+    cache.drop_pending(records)
+    return len(comments)
+
+
+def quarantine(records):
+    """Откладывает пачку, которую не удалось записать, в файл .failed.
+
+    Такие файлы flush() не читает: их разбирают вручную, а остальная
+    очередь продолжает записываться.
+    """
+    path = queue_path(f'{QUEUE_NAME}.{time.time_ns()}{FAILED_SUFFIX}')
+    with open(path, 'a', encoding='utf-8') as failed:
+        for record in records:
+            failed.write(json.dumps(record, ensure_ascii=False) + '\n')
+    cache.drop_pending(records)
+    return path
+
+
+def save_or_quarantine(records):
+    try:
+        return save_batch(records)
+    except DatabaseError:
+        logger.exception(
+            'Пачка из %s комментариев отложена в %s',
+            len(records), quarantine(records),
+        )
+        return 0
+
+
+def flush(batch_size=None):
+    """Записывает очередь в базу, возвращает число комментариев."""
+    batch_size = batch_size or settings.COMMENT_QUEUE_BATCH_SIZE
+    total = 0
+    for path in rotate():
+        batch = []
+        for record in read_records(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                total += save_or_quarantine(batch)
+                batch = []
+        if batch:
+            total += save_or_quarantine(batch)
+        os.remove(path)
+    return total
@@ -0,0 +1,79 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются сигналами одним UPDATE ... SET n = n + 1 в той же
+транзакции, что и сама запись. Расхождения чинит
+``manage.py recount_counters``.
+"""
+from django.db import router
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def change_user(user_id, **deltas):
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_users(user_ids, **deltas):
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def user_counts(users):
+    return users.annotate(
+        posts_total=_count(Post, 'author'),
+        followers_total=_count(Follow, 'author'),
+        following_total=_count(Follow, 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+
+
+def recount_users(users=None):
+    if users is None:
+        users = User.objects.all()
+    total = 0
+    for pk, *counts in user_counts(users).iterator():
+        UserStats.objects.update_or_create(
+            user_id=pk,
+            defaults=dict(zip(STATS_FIELDS, counts)),
+        )
+        total += 1
+    return total
+
+
+def recount_comments(posts=None):
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.update(comments_count=_count(Comment, 'post'))
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users(User.objects.filter(pk=user.pk))
+        # Реплика могла ещё не получить только что созданную строку
+        return UserStats.objects.using(
+            router.db_for_write(UserStats)
+        ).get(user=user)
@@ -0,0 +1,146 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора раскладывается в FeedEntry всех его подписчиков,
+поэтому /follow/ читает одну таблицу по индексу (user, -pub_date).
+Посты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+не раскладываются, а подтягиваются при чтении (pull).
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+
+def celebrity_ids(authors=None):
+    celebrities = UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    )
+    if authors is not None:
+        celebrities = celebrities.filter(user__in=authors)
+    return set(celebrities.values_list('user_id', flat=True))
+
+
+def is_celebrity(author):
+    return UserStats.objects.filter(
+        user=author, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in Follow.objects.filter(
+                author=post.author_id
+            ).values_list('user', flat=True).iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(posts):
+    """fan_out для пачки постов, записанных bulk_create.
+
+    Подписчики всех авторов пачки читаются одним запросом.
+    """
+    authors = {post.author_id for post in posts}
+    authors -= celebrity_ids(authors)
+    followers = defaultdict(list)
+    for author, user in Follow.objects.filter(
+        author__in=authors
+    ).values_list('author', 'user').iterator():
+        followers[author].append(user)
+    entries = (
+        FeedEntry(user_id=user, post=post, pub_date=post.pub_date)
+        for post in posts
+        for user in followers[post.author_id]
+    )
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user, authors):
+    """Раскладывает посты новых подписок пользователя в его ленту.
+
+    Посты авторов, у которых их не больше FEED_BACKFILL_LIMIT, читаются
+    одним запросом, и только у плодовитых авторов — по запросу на автора.
+    """
+    authors = set(authors) - celebrity_ids(authors)
+    prolific = set(UserStats.objects.filter(
+        user__in=authors, posts_count__gt=settings.FEED_BACKFILL_LIMIT
+    ).values_list('user_id', flat=True))
+    posts = Post.objects.values_list('pk', 'pub_date')
+    querysets = [posts.filter(author__in=authors - prolific)]
+    querysets.extend(
+        posts.filter(author=author)[:settings.FEED_BACKFILL_LIMIT]
+        for author in prolific
+    )
+    entries = (
+        FeedEntry(user_id=user, post_id=pk, pub_date=pub_date)
+        for queryset in querysets
+        for pk, pub_date in queryset
+    )
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_followers(author, users):
+    """Раскладывает последние посты автора в ленты новых подписчиков.
+
+    Для массовой загрузки: один запрос постов на автора вместо
+    запроса на каждую подписку, как у backfill.
+    """
+    if is_celebrity(author):
+        return
+    posts = list(Post.objects.filter(author=author).values_list(
+        'pk', 'pub_date'
+    )[:settings.FEED_BACKFILL_LIMIT])
+    entries = (
+        FeedEntry(user_id=user, post_id=pk, pub_date=pub_date)
+        for user in users
+        for pk, pub_date in posts
+    )
+    # bulk_create превращает аргумент в список, поэтому пачки
+    # нарезаются заранее, чтобы не держать в памяти все записи сразу
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def prune(user, authors):
+    """Убирает из ленты user посты авторов authors."""
+    FeedEntry.objects.filter(user=user, post__author__in=authors).delete()
+
+
+def follow_feed(user):
+    """Посты ленты с ключом пагинации feed_date/feed_post.
+
+    Без звёздных подписок ключ берётся из FeedEntry, и выборка идёт
+    по индексу (user, -pub_date, -post) без сортировки.
+    """
+    celebrities = celebrity_ids(
+        Follow.objects.filter(user=user).values('author')
+    )
+    if not celebrities:
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        )
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
@@ -0,0 +1,126 @@
+"""Массовые подписки и отписки по списку имён.
+
+Авторы находятся одним запросом, подписки вставляются одним
+bulk_create и удаляются одним DELETE. Сигналы при этом не срабатывают,
+поэтому счётчики, лента, граф подписок и версии кэша обновляются здесь
+же.
+"""
+from django.db import transaction
+
+from core.db import write_transaction
+
+from . import cache, counters, feed, graph
+from .models import Follow, User, UserStats
+
+FOLLOWED = 'followed'
+ALREADY_FOLLOWING = 'already_following'
+UNFOLLOWED = 'unfollowed'
+NOT_FOLLOWING = 'not_following'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def resolve(usernames):
+    """Имена без повторов и {имя: pk} найденных авторов."""
+    usernames = list(dict.fromkeys(usernames))
+    authors = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'pk'))
+    return usernames, authors
+
+
+@write_transaction()
+def follow_many(user, usernames):
+    """Подписывает user на авторов, возвращает {имя: статус}.
+
+    Строка UserStats подписчика блокируется до чтения его подписок.
+    Одиночная подписка меняет эту строку в своей транзакции, поэтому
+    она либо уже видна в existing, либо дождётся конца этой: иначе
+    bulk_create молча пропустил бы её строку, а счётчики выросли бы
+    на неё дважды.
+    """
+    usernames, authors = resolve(usernames)
+    list(UserStats.objects.select_for_update().filter(user=user))
+    existing = set(Follow.objects.filter(
+        user=user, author__in=authors.values()
+    ).values_list('author_id', flat=True))
+    results = {}
+    new = []
+    for username in usernames:
+        pk = authors.get(username)
+        if pk is None:
+            results[username] = NOT_FOUND
+        elif pk == user.pk:
+            results[username] = SELF
+        elif pk in existing:
+            results[username] = ALREADY_FOLLOWING
+        else:
+            results[username] = FOLLOWED
+            new.append(pk)
+    if not new:
+        return results
+    Follow.objects.bulk_create(
+        (Follow(user=user, author_id=pk) for pk in new),
+        ignore_conflicts=True,
+    )
+    counters.change_user(user.pk, following_count=len(new))
+    counters.change_users(new, followers_count=1)
+    feed.backfill(user.pk, new)
+
+    def update_graph():
+        for pk in new:
+            graph.edge_added(user.pk, pk)
+
+    transaction.on_commit(update_graph)
+    cache.bump(
+        cache.author_scope(user.username),
+        *(
+            cache.author_scope(username) for username, status
+            in results.items() if status == FOLLOWED
+        ),
+    )
+    return results
+
+
+@write_transaction()
+def unfollow_many(user, usernames):
+    """Отписывает user от авторов, возвращает {имя: статус}.
+
+    Подписки удаляются одним DELETE без сигналов post_delete: иначе
+    каждая строка стоила бы своих запросов к ленте, счётчикам и кэшу.
+    Строка UserStats блокируется, как и в follow_many.
+    """
+    usernames, authors = resolve(usernames)
+    list(UserStats.objects.select_for_update().filter(user=user))
+    follows = Follow.objects.filter(user=user, author__in=authors.values())
+    existing = set(follows.values_list('author_id', flat=True))
+    results = {}
+    for username in usernames:
+        pk = authors.get(username)
+        if pk is None:
+            results[username] = NOT_FOUND
+        elif pk in existing:
+            results[username] = UNFOLLOWED
+        else:
+            results[username] = NOT_FOLLOWING
+    if not existing:
+        return results
+    # У Follow нет зависимых моделей, каскад собирать не нужно
+    follows._raw_delete(follows.db)
+    counters.change_user(user.pk, following_count=-len(existing))
+    counters.change_users(existing, followers_count=-1)
+    feed.prune(user.pk, existing)
+
+    def update_graph():
+        for pk in existing:
+            graph.edge_removed(user.pk, pk)
+
+    transaction.on_commit(update_graph)
+    cache.bump(
+        cache.author_scope(user.username),
+        *(
+            cache.author_scope(username) for username, status
+            in results.items() if status == UNFOLLOWED
+        ),
+    )
+    return results
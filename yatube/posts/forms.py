@@ -1,13 +1,37 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize
 from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    image_hash = None
+
     class Meta:
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image, self.image_hash = normalize(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if self.image_hash:
+            post.image_hash = self.image_hash
+            duplicate = Post.objects.filter(
+                image_hash=self.image_hash
+            ).exclude(pk=post.pk).values_list('image', flat=True).first()
+            if duplicate and post.image.storage.exists(duplicate):
+                post.image = duplicate
+        if commit:
+            post.save()
+            self._save_m2m()
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta():
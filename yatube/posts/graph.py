@@ -0,0 +1,272 @@
+"""Граф подписок в памяти процесса.
+
+Для каждого пользователя хранятся два отсортированных массива array('i')
+— на кого он подписан и кто подписан на него, по 4 байта на ключ.
+Пользователи разложены по FOLLOW_GRAPH_SHARDS шардам со своими
+блокировками, поэтому запись в одном шарде не задерживает чтение
+в остальных.
+
+Граф строится из Follow при старте воркера (preload() в wsgi.py) или
+при первом обращении и дальше меняется сигналами после коммита.
+Другие процессы об этих изменениях не знают, поэтому раз в
+FOLLOW_GRAPH_REFRESH секунд граф перестраивается в фоновом потоке,
+а запросы пока читают старую копию. Изменения, пришедшие во время
+перестройки, переносятся в новый граф. Если подписок
+больше FOLLOW_GRAPH_MAX_EDGES, граф не строится: get_graph() вернёт
+None, и страницы читают подписки из базы.
+"""
+import logging
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Follow
+
+TYPECODE = 'i'
+
+logger = logging.getLogger(__name__)
+
+_graph = None
+_built = 0.0
+_generation = ''
+# Изменения, пришедшие во время перестройки: новый граф строится по
+# снимку Follow и без них потерял бы их до следующей перестройки.
+_journal = None
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+class Shard:
+    __slots__ = ('lock', 'following', 'followers')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.following = {}
+        self.followers = {}
+
+
+def insert(table, key, value):
+    ids = table.get(key)
+    if ids is None:
+        table[key] = array(TYPECODE, (value,))
+        return True
+    index = bisect_left(ids, value)
+    if index < len(ids) and ids[index] == value:
+        return False
+    ids.insert(index, value)
+    return True
+
+
+def discard(table, key, value):
+    ids = table.get(key)
+    if ids is None:
+        return False
+    index = bisect_left(ids, value)
+    if index == len(ids) or ids[index] != value:
+        return False
+    del ids[index]
+    if not ids:
+        del table[key]
+    return True
+
+
+def contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+class FollowGraph:
+    def __init__(self, shards=None):
+        self.shards = [
+            Shard() for _ in range(shards or settings.FOLLOW_GRAPH_SHARDS)
+        ]
+        self.edges = 0
+
+    def shard(self, user_id):
+        return self.shards[user_id % len(self.shards)]
+
+    def load(self, edges):
+        """Быстрая загрузка пар (подписчик, автор) до finish()."""
+        for user_id, author_id in edges:
+            for table, key, value in (
+                (self.shard(user_id).following, user_id, author_id),
+                (self.shard(author_id).followers, author_id, user_id),
+            ):
+                ids = table.get(key)
+                if ids is None:
+                    ids = table[key] = array(TYPECODE)
+                ids.append(value)
+
+    def finish(self):
+        """Сортирует массивы после load() и убирает повторы."""
+        self.edges = 0
+        for shard in self.shards:
+            for table in (shard.following, shard.followers):
+                for key, ids in table.items():
+                    table[key] = array(TYPECODE, sorted(set(ids)))
+            self.edges += sum(map(len, shard.following.values()))
+        return self
+
+    def add(self, user_id, author_id):
+        shard = self.shard(user_id)
+        with shard.lock:
+            added = insert(shard.following, user_id, author_id)
+            self.edges += added
+        shard = self.shard(author_id)
+        with shard.lock:
+            insert(shard.followers, author_id, user_id)
+
+    def remove(self, user_id, author_id):
+        shard = self.shard(user_id)
+        with shard.lock:
+            removed = discard(shard.following, user_id, author_id)
+            self.edges -= removed
+        shard = self.shard(author_id)
+        with shard.lock:
+            discard(shard.followers, author_id, user_id)
+
+    def following(self, user_id):
+        """На кого подписан пользователь; массив только для чтения."""
+        return self.shard(user_id).following.get(user_id, array(TYPECODE))
+
+    def followers(self, author_id):
+        return self.shard(author_id).followers.get(
+            author_id, array(TYPECODE)
+        )
+
+    def follows(self, user_id, author_id):
+        return contains(self.following(user_id), author_id)
+
+    def mutual(self, user_id):
+        """Подписки пользователя, подписанные на него в ответ."""
+        following = self.following(user_id)
+        followers = self.followers(user_id)
+        if len(following) > len(followers):
+            following, followers = followers, following
+        return [pk for pk in following if contains(followers, pk)]
+
+    def suggested(self, user_id, limit, scan=None):
+        """Авторы, на которых подписаны авторы пользователя.
+
+        Просматриваются не больше scan подписок на каждом шаге, так что
+        время не зависит от размера графа.
+        """
+        scan = scan or settings.FOLLOW_GRAPH_SUGGEST_SCAN
+        following = self.following(user_id)
+        counts = Counter()
+        for author_id in following[:scan]:
+            counts.update(self.following(author_id)[:scan])
+        return [
+            pk for pk, _ in counts.most_common(limit + len(following) + 1)
+            if pk != user_id and not contains(following, pk)
+        ][:limit]
+
+    def memory(self):
+        """Примерный объём графа в байтах."""
+        total = sys.getsizeof(self.shards)
+        for shard in self.shards:
+            for table in (shard.following, shard.followers):
+                total += sys.getsizeof(table) + sum(
+                    sys.getsizeof(key) + sys.getsizeof(ids)
+                    for key, ids in table.items()
+                )
+        return total
+
+
+def build():
+    if Follow.objects.count() > settings.FOLLOW_GRAPH_MAX_EDGES:
+        logger.warning(
+            'Подписок больше FOLLOW_GRAPH_MAX_EDGES, граф не строится'
+        )
+        return None
+    graph = FollowGraph()
+    graph.load(
+        Follow.objects.order_by().values_list('user_id', 'author_id')
+        .iterator(chunk_size=settings.FOLLOW_GRAPH_BATCH_SIZE)
+    )
+    return graph.finish()
+
+
+def rebuild():
+    global _graph, _built, _generation, _journal, _rebuilding
+    with _lock:
+        _journal = []
+    try:
+        graph = build()
+        with _lock:
+            if graph is not None:
+                for change, user_id, author_id in _journal:
+                    change(graph, user_id, author_id)
+            _graph, _built = graph, time.monotonic()
+            _generation = str(time.time_ns())
+    finally:
+        with _lock:
+            _journal = None
+            _rebuilding = False
+
+
+def rebuild_in_background():
+    try:
+        rebuild()
+    finally:
+        connection.close()
+
+
+def get_graph():
+    """Текущий граф или None, если он слишком большой."""
+    global _rebuilding
+    if not _built:
+        with _build_lock:
+            if not _built:
+                rebuild()
+        return _graph
+    if time.monotonic() - _built > settings.FOLLOW_GRAPH_REFRESH:
+        with _lock:
+            start = not _rebuilding
+            _rebuilding = True
+        if start:
+            threading.Thread(
+                target=rebuild_in_background, daemon=True
+            ).start()
+    return _graph
+
+
+def preload():
+    """Строит граф при старте воркера, а не в первом запросе."""
+    if not _built:
+        get_graph()
+
+
+def generation():
+    """Метка текущей копии графа для ETag страниц, читающих из него."""
+    return _generation
+
+
+def reset():
+    global _graph, _built, _generation
+    with _lock:
+        _graph, _built, _generation = None, 0.0, ''
+
+
+def apply(change, user_id, author_id):
+    with _lock:
+        if _journal is not None:
+            _journal.append((change, user_id, author_id))
+        graph = _graph
+    if graph is not None:
+        change(graph, user_id, author_id)
+
+
+def edge_added(user_id, author_id):
+    apply(FollowGraph.add, user_id, author_id)
+
+
+def edge_removed(user_id, author_id):
+    apply(FollowGraph.remove, user_id, author_id)
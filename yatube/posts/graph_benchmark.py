@@ -0,0 +1,65 @@
+"""Замер графа подписок posts.graph на синтетических подписках.
+
+Граф строится без базы: популярность авторов распределена по закону
+Ципфа, как у generate_data. Отдельно меряются построение, память и
+запросы, которые делают страницы подписчиков и рекомендаций.
+"""
+import random
+import time
+
+from django.conf import settings
+
+from core.profiling import PERCENTILES, percentile
+
+from . import graph
+from .loadtest import Zipf, batches
+
+
+def benchmark(users, edges, exponent=1.0, queries=1000, seed=0,
+              batch_size=100000):
+    """Строит граф из edges подписок и замеряет его запросы, мкс."""
+    rng = random.Random(seed)
+    authors = Zipf(range(1, users + 1), exponent, rng)
+    follow_graph = graph.FollowGraph()
+    started = time.perf_counter()
+    for size in batches(edges, batch_size):
+        follow_graph.load(
+            (user, author) for user, author in zip(
+                (rng.randrange(1, users + 1) for _ in range(size)),
+                authors.sample(size),
+            )
+            if user != author
+        )
+    follow_graph.finish()
+    build_seconds = time.perf_counter() - started
+    memory = follow_graph.memory()
+    readers = [rng.randrange(1, users + 1) for _ in range(queries)]
+    popular = authors.sample(queries)
+    operations = {
+        'following': lambda user, author: follow_graph.following(user),
+        'followers_page': lambda user, author: follow_graph.followers(
+            author
+        )[:settings.PAGE_LIM],
+        'follows': lambda user, author: follow_graph.follows(user, author),
+        'mutual': lambda user, author: follow_graph.mutual(user),
+        'suggested': lambda user, author: follow_graph.suggested(
+            user, settings.FOLLOW_SUGGESTIONS
+        ),
+    }
+    results = {
+        'edges': follow_graph.edges,
+        'build_seconds': round(build_seconds, 2),
+        'memory_mb': round(memory / 2 ** 20, 1),
+        'bytes_per_edge': round(memory / max(follow_graph.edges, 1), 1),
+    }
+    for name, operation in operations.items():
+        timings = []
+        for user, author in zip(readers, popular):
+            started = time.perf_counter()
+            operation(user, author)
+            timings.append((time.perf_counter() - started) * 10 ** 6)
+        results[name] = {
+            f'p{percent}_us': round(percentile(timings, percent), 1)
+            for percent in PERCENTILES
+        }
+    return results
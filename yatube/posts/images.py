@@ -0,0 +1,81 @@
+"""Нормализация картинок при загрузке.
+
+Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет во временный
+файл, а здесь картинка проверяется по размеру файла и числу пикселей
+ещё до декодирования, поворачивается по EXIF, уменьшается до
+POST_IMAGE_MAX_SIDE и пережимается без метаданных. Хэш содержимого
+позволяет не хранить одинаковые файлы дважды.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+KEPT_FORMATS = {'PNG': '.png', 'GIF': '.gif'}
+DEFAULT_FORMAT = ('JPEG', '.jpg')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def open_checked(upload):
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            },
+        )
+    upload.seek(0)
+    try:
+        # Image.open читает только заголовок, пиксели ещё не декодированы
+        image = Image.open(upload)
+    except (Image.DecompressionBombError, OSError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+    return image
+
+
+def normalize(upload):
+    """Возвращает (пережатый файл, хэш его содержимого)."""
+    image = open_checked(upload)
+    if getattr(image, 'is_animated', False):
+        # Анимацию не пережимаем, чтобы не потерять кадры
+        upload.seek(0)
+        data = upload.read()
+        return ContentFile(data, name=upload.name), content_hash(data)
+    source_format = image.format
+    image = ImageOps.exif_transpose(image)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if source_format in KEPT_FORMATS:
+        image_format, extension = source_format, KEPT_FORMATS[source_format]
+        options = {'optimize': True}
+    else:
+        image_format, extension = DEFAULT_FORMAT
+        image = image.convert('RGB')
+        options = {
+            'quality': settings.POST_IMAGE_UPLOAD_QUALITY,
+            'optimize': True,
+            'progressive': True,
+        }
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    data = buffer.getvalue()
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return ContentFile(data, name=name), content_hash(data)
@@ -0,0 +1,417 @@
+"""Синтетические данные и замеры страниц для нагрузочного тестирования.
+
+generate() заполняет базу пачками bulk_create: популярность авторов
+распределена по закону Ципфа, поэтому у немногих авторов большая часть
+постов и подписчиков, как в живой соцсети. Сигналы при bulk_create
+не срабатывают, и счётчики, ленты и поисковый индекс пересчитываются
+в конце.
+
+benchmark() прогоняет страницы через тестовый клиент и считает
+перцентили задержки, запросы к базе и пиковую память.
+"""
+import logging
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import (DEFAULT_DB_ALIAS, OperationalError, connection,
+                       connections)
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core.db import write_transaction
+from core.profiling import PERCENTILES, percentile
+
+from . import cache, counters, feed, search
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .transfer import keep_dates
+
+# Ошибки «database is locked» считаются, а не пишутся в лог
+request_logger = logging.getLogger('django.request')
+
+POST_AGE = timedelta(days=365)
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+# Настройки SQLite по умолчанию в Django, до core.db
+UNTUNED_SQLITE = {
+    'SQLITE_PRAGMAS': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    'SQLITE_BEGIN_IMMEDIATE': False,
+}
+
+
+class Zipf:
+    """Случайный выбор из списка, где k-й элемент весит 1 / k ** s."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.rng = rng
+
+    def sample(self, k):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights,
+                                k=k)
+
+
+def batches(total, size):
+    for start in range(0, total, size):
+        yield min(size, total - start)
+
+
+def new_pks(model, last_pk):
+    return list(model.objects.filter(pk__gt=last_pk).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def create_users(total, prefix, batch_size):
+    usernames = [f'{prefix}{number}' for number in range(total)]
+    User.objects.bulk_create(
+        (
+            User(username=username, password=make_password(None))
+            for username in usernames
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    pks = dict(User.objects.filter(
+        username__startswith=prefix
+    ).values_list('username', 'pk'))
+    pks = [pks[username] for username in usernames]
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in pks),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return pks
+
+
+def create_groups(total, fake):
+    Group.objects.bulk_create(
+        (
+            Group(
+                slug=f'group-{number}', title=fake.word().capitalize(),
+                description=fake.sentence(),
+            )
+            for number in range(total)
+        ),
+        ignore_conflicts=True,
+    )
+    return list(Group.objects.filter(
+        slug__in=[f'group-{number}' for number in range(total)]
+    ).values_list('pk', flat=True))
+
+
+def random_group(groups, rng):
+    """Половина постов публикуется без группы."""
+    if groups and rng.random() < 0.5:
+        return rng.choice(groups)
+    return None
+
+
+def create_posts(total, authors, groups, fake, rng, batch_size):
+    now = timezone.now()
+    for size in batches(total, batch_size):
+        Post.objects.bulk_create(
+            Post(
+                text=fake.paragraph(nb_sentences=rng.randint(1, 6)),
+                author_id=author,
+                group_id=random_group(groups, rng),
+                pub_date=now - POST_AGE * rng.random(),
+            )
+            for author in authors.sample(size)
+        )
+
+
+def create_follows(per_user, users, authors, rng, batch_size):
+    """Каждый подписан в среднем на per_user авторов."""
+    pairs = set()
+    for user in users:
+        wanted = rng.randint(0, 2 * per_user)
+        pairs.update(
+            (user, author) for author in authors.sample(wanted)
+            if author != user
+        )
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return pairs
+
+
+def create_comments(total, posts, users, fake, rng, batch_size):
+    now = timezone.now()
+    for size in batches(total, batch_size):
+        Comment.objects.bulk_create(
+            Comment(
+                post_id=rng.choice(posts), author_id=rng.choice(users),
+                text=fake.sentence(), created=now - POST_AGE * rng.random(),
+            )
+            for _ in range(size)
+        )
+
+
+def generate(users, posts, groups=10, follows=20, comments=0,
+             exponent=1.1, seed=None, prefix='user', batch_size=None,
+             log=print):
+    """Создаёт данные и возвращает число объектов каждого вида."""
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    started = time.time()
+
+    def step(message):
+        log(f'{message} ({time.time() - started:.1f} с)')
+
+    with write_transaction(), keep_dates():
+        user_pks = create_users(users, prefix, batch_size)
+        step(f'Пользователей: {len(user_pks)}')
+        authors = Zipf(user_pks, exponent, rng)
+        group_pks = create_groups(groups, fake)
+        start = last_pk(Post)
+        create_posts(posts, authors, group_pks, fake, rng, batch_size)
+        post_pks = new_pks(Post, start)
+        step(f'Постов: {len(post_pks)}')
+        pairs = create_follows(follows, user_pks, authors, rng, batch_size)
+        step(f'Подписок: {len(pairs)}')
+        if post_pks:
+            create_comments(
+                comments, post_pks, user_pks, fake, rng, batch_size
+            )
+        step(f'Комментариев: {comments}')
+
+        followers = defaultdict(list)
+        for user, author in pairs:
+            followers[author].append(user)
+        for author, readers in followers.items():
+            feed.backfill_followers(author, readers)
+        step('Ленты заполнены')
+        # Списки ключей длиннее лимита параметров SQLite, поэтому
+        # новые строки выбираются диапазоном
+        new_posts = Post.objects.filter(pk__gt=start)
+        for post in new_posts.iterator():
+            search.index_post(post)
+        step('Поисковый индекс построен')
+        counters.recount_users(User.objects.filter(
+            username__startswith=prefix
+        ))
+        counters.recount_comments(new_posts)
+        step('Счётчики пересчитаны')
+    cache.bump(
+        cache.feed_scope(),
+        *(cache.author_scope(f'{prefix}{number}')
+          for number in range(users)),
+        *(cache.group_scope(f'group-{number}') for number in range(groups)),
+    )
+    return {
+        'users': len(user_pks),
+        'groups': len(group_pks),
+        'posts': len(post_pks),
+        'follows': len(pairs),
+        'comments': comments if post_pks else 0,
+    }
+
+
+def targets():
+    """Самые тяжёлые страницы каждого вида в текущей базе."""
+    author = User.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    reader = User.objects.annotate(
+        total=Count('follower')
+    ).order_by('-total').first()
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    pages = {'index': (reverse('posts:index'), None)}
+    if group:
+        pages['group_posts'] = (
+            reverse('posts:group_list', args=(group.slug,)), None
+        )
+    if author:
+        pages['profile'] = (
+            reverse('posts:profile', args=(author.username,)), None
+        )
+    if post:
+        pages['post_detail'] = (
+            reverse('posts:post_detail', args=(post.pk,)), None
+        )
+    if reader:
+        pages['follow_index'] = (reverse('posts:follow_index'), reader)
+    return pages
+
+
+def measure(client, url, requests, warmup):
+    for _ in range(warmup):
+        client.get(url)
+    timings = []
+    queries = []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+        queries.append(len(captured))
+    # tracemalloc замедляет всё в разы, поэтому память меряется отдельно
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent) * 1000, 2)
+        for percent in PERCENTILES
+    }
+    result.update(
+        status=response.status_code,
+        queries=max(queries),
+        peak_memory_kb=round(peak / 1024, 1),
+    )
+    return result
+
+
+def benchmark(requests=50, warmup=3, use_cache=False, views=None):
+    """Замеры по страницам; без use_cache кэш страниц отключён."""
+    overrides = {'ALLOWED_HOSTS': ['testserver']}
+    if not use_cache:
+        overrides['CACHES'] = NO_CACHE
+    results = {}
+    with override_settings(**overrides):
+        for name, (url, user) in targets().items():
+            if views and name not in views:
+                continue
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            results[name] = dict(
+                url=url, **measure(client, url, requests, warmup)
+            )
+    return results
+
+
+def compare(baseline, current):
+    """Строки отчёта: метрика, было, стало и изменение в процентах."""
+    for name, metrics in current.items():
+        before = baseline.get(name, {})
+        for metric, value in metrics.items():
+            if metric in ('url', 'status') or metric not in before:
+                continue
+            old = before[metric]
+            change = (value - old) / old * 100 if old else 0.0
+            yield name, metric, old, value, change
+
+
+def write_comments(user, post, comments, barrier, results):
+    client = Client()
+    try:
+        client.force_login(user)
+    except Exception:
+        barrier.abort()
+        raise
+    url = reverse('posts:add_comment', args=(post.pk,))
+    timings = []
+    errors = 0
+    barrier.wait()
+    try:
+        for number in range(comments):
+            started = time.perf_counter()
+            try:
+                client.post(url, {'text': f'Комментарий {number}'})
+            except OperationalError:
+                errors += 1
+            timings.append(time.perf_counter() - started)
+    finally:
+        connections.close_all()
+    results.append((timings, errors))
+
+
+def comment_contention(threads=8, comments=50, tuned=True):
+    """Комментарии к одному посту из нескольких потоков сразу.
+
+    Без tuned соединения получают настройки SQLite, которые были
+    до core.db: журнал DELETE, отложенный BEGIN и новое соединение
+    на каждый запрос.
+    """
+    database = connections.databases[DEFAULT_DB_ALIAS]
+    overrides = {'ALLOWED_HOSTS': ['testserver'], 'CACHES': NO_CACHE}
+    conn_max_age = database['CONN_MAX_AGE']
+    if not tuned:
+        overrides.update(UNTUNED_SQLITE)
+        database['CONN_MAX_AGE'] = 0
+    author = User.objects.create(username=f'contention-{time.time()}')
+    post = Post.objects.create(text='Пост для комментариев', author=author)
+    users = [
+        User.objects.create(username=f'{author.username}-{number}')
+        for number in range(threads)
+    ]
+    results = []
+    try:
+        with override_settings(**overrides):
+            # Новые настройки применяются к новым соединениям. Режим
+            # журнала меняется только без других соединений, поэтому
+            # его выставляет первое соединение, до запуска потоков
+            connections.close_all()
+            connection.ensure_connection()
+            barrier = threading.Barrier(threads + 1)
+            workers = [
+                threading.Thread(
+                    target=write_comments,
+                    args=(user, post, comments, barrier, results),
+                )
+                for user in users
+            ]
+            request_logger.disabled = True
+            for worker in workers:
+                worker.start()
+            try:
+                barrier.wait()
+                started = time.perf_counter()
+            finally:
+                for worker in workers:
+                    worker.join()
+                request_logger.disabled = False
+            elapsed = time.perf_counter() - started
+            connections.close_all()
+        written = Comment.objects.filter(post=post).count()
+    finally:
+        database['CONN_MAX_AGE'] = conn_max_age
+        User.objects.filter(
+            username__startswith=author.username
+        ).delete()
+    timings = [timing for worker, _ in results for timing in worker]
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent) * 1000, 2)
+        for percent in PERCENTILES
+    }
+    result.update(
+        written=written,
+        errors=sum(errors for _, errors in results),
+        comments_per_second=round(written / elapsed, 1),
+    )
+    return result
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import loadtest
+
+MODES = {
+    'untuned': (False,),
+    'tuned': (True,),
+    'both': (False, True),
+}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет конкурентную запись комментариев в один пост '
+            'с настройками SQLite из core.db и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Число пишущих потоков',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=50,
+            help='Комментариев от каждого потока',
+        )
+        parser.add_argument(
+            '--mode', choices=MODES, default='both',
+            help='Какие настройки замерить',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and (
+            connection.is_in_memory_db()
+        ):
+            raise CommandError('Нужна база SQLite в файле')
+        for tuned in MODES[options['mode']]:
+            result = loadtest.comment_contention(
+                threads=options['threads'],
+                comments=options['comments'],
+                tuned=tuned,
+            )
+            name = 'tuned' if tuned else 'untuned'
+            self.stdout.write(
+                f'{name:<8} {result["comments_per_second"]:>8} комм./с  '
+                f'p50 {result["p50_ms"]:>8} мс  '
+                f'p95 {result["p95_ms"]:>8} мс  '
+                f'p99 {result["p99_ms"]:>8} мс  '
+                f'ошибок {result["errors"]:>4}  '
+                f'записано {result["written"]:>5}'
+            )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from posts import graph_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет построение, память и запросы графа подписок '
+            'на синтетических данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=10 ** 6,
+            help='Число пользователей',
+        )
+        parser.add_argument(
+            '--edges', type=int, default=10 ** 7,
+            help='Число подписок',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.0,
+            help='Показатель закона Ципфа для популярности авторов',
+        )
+        parser.add_argument(
+            '--queries', type=int, default=1000,
+            help='Запросов каждого вида',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = graph_benchmark.benchmark(
+            users=options['users'],
+            edges=options['edges'],
+            exponent=options['exponent'],
+            queries=options['queries'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f'Подписок: {results.pop("edges")}, '
+            f'построение {results.pop("build_seconds")} с, '
+            f'память {results.pop("memory_mb")} МБ '
+            f'({results.pop("bytes_per_edge")} байт на подписку)'
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<15} p50 {metrics["p50_us"]:>9} мкс  '
+                f'p95 {metrics["p95_us"]:>9} мкс  '
+                f'p99 {metrics["p99_us"]:>9} мкс'
+            )
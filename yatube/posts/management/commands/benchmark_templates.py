@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core import templating
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендер шаблона с кэшем разобранных шаблонов '
+            'и без него')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--renders', type=int, default=200,
+            help='Рендеров в замере',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Рендеров для прогрева перед замером',
+        )
+        parser.add_argument(
+            '--template', default='posts/index.html',
+            help='Замеряемый шаблон',
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get(reverse('posts:index'))
+        request.user = AnonymousUser()
+        # Страница ленты читается из базы один раз, до замера
+        page = Paginator(
+            Post.objects.for_feed(), settings.PAGE_LIM
+        ).get_page(1)
+        list(page)
+        results = templating.benchmark(
+            options['template'],
+            {'page_obj': page, 'popular': False},
+            request,
+            renders=options['renders'],
+            warmup=options['warmup'],
+        )
+        warmup = results.pop('warmup')
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<9} первый {metrics["first_ms"]:>8} мс  '
+                f'p50 {metrics["p50_ms"]:>8} мс  '
+                f'p95 {metrics["p95_ms"]:>8} мс  '
+                f'p99 {metrics["p99_ms"]:>8} мс'
+            )
+        self.stdout.write(
+            f'Прогрев: {warmup["templates"]} шаблонов за '
+            f'{warmup["warmup_ms"]} мс, первый рендер после него '
+            f'{warmup["first_ms"]} мс'
+        )
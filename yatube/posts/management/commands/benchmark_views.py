@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import loadtest
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, число запросов и память страниц '
+            'index, group_posts, profile, post_detail и follow_index')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов к каждой странице',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Запросов для прогрева перед замером',
+        )
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Не отключать кэш страниц',
+        )
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Замерить только эту страницу, можно повторять',
+        )
+        parser.add_argument(
+            '--output',
+            help='Сохранить результат в JSON как базовую линию',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON базовой линии для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        results = loadtest.benchmark(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            use_cache=options['cache'],
+            views=options['views'],
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<14} p50 {metrics["p50_ms"]:>8} мс  '
+                f'p95 {metrics["p95_ms"]:>8} мс  '
+                f'p99 {metrics["p99_ms"]:>8} мс  '
+                f'запросов {metrics["queries"]:>3}  '
+                f'память {metrics["peak_memory_kb"]:>8} КБ'
+            )
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                baseline = json.load(baseline)['views']
+            for name, metric, old, new, change in loadtest.compare(
+                baseline, results
+            ):
+                style = (
+                    self.style.ERROR if change > 0 else self.style.SUCCESS
+                )
+                self.stdout.write(style(
+                    f'{name:<14} {metric:<16} {old:>10} -> {new:>10} '
+                    f'({change:+.1f}%)'
+                ))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(
+                    {
+                        'requests': options['requests'],
+                        'cache': options['cache'],
+                        'views': results,
+                    },
+                    output, indent=2, ensure_ascii=False,
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия сохранена в {options["output"]}'
+            ))
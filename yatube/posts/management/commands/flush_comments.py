@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = 'Переносит комментарии из очереди в базу'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.COMMENT_QUEUE_INTERVAL,
+            help='Пауза в секундах между проходами',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            saved = comment_queue.flush()
+            if saved:
+                done += saved
+                self.stdout.write(f'Записано комментариев: {saved}')
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Всего комментариев: {done}'))
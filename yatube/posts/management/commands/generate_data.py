@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Число пользователей',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=10000,
+            help='Число постов',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=10,
+            help='Число групп',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=20000,
+            help='Число комментариев',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности авторов',
+        )
+        parser.add_argument(
+            '--seed', type=int,
+            help='Зерно генератора для воспроизводимых данных',
+        )
+        parser.add_argument(
+            '--prefix', default='user',
+            help='Префикс имён пользователей',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.FEED_BATCH_SIZE,
+            help='Размер пачки bulk_create',
+        )
+
+    def handle(self, *args, **options):
+        created = loadtest.generate(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            comments=options['comments'],
+            exponent=options['zipf'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'{name}: {total}' for name, total in created.items()
+        )))
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, OutputWrapper
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output', default='-',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.TRANSFER_BATCH_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+        parser.add_argument(
+            '--media',
+            help='Каталог, куда скопировать картинки постов',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.TRANSFER_MEDIA_WORKERS,
+            help='Число потоков копирования картинок',
+        )
+
+    def export(self, output, chunk_size):
+        rows = 0
+        for line in transfer.export_rows(chunk_size):
+            output.write(line)
+            rows += 1
+        return rows
+
+    def handle(self, *args, **options):
+        started = time.time()
+        if options['output'] == '-':
+            rows = self.export(self.stdout, options['chunk_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                rows = self.export(
+                    OutputWrapper(output), options['chunk_size']
+                )
+        copied = 0
+        if options['media']:
+            target = FileSystemStorage(location=options['media'])
+            names = transfer.media_names()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                while True:
+                    chunk = list(islice(names, options['chunk_size']))
+                    if not chunk:
+                        break
+                    copied += sum(pool.map(
+                        lambda name: transfer.copy_media(
+                            name, default_storage, target
+                        ),
+                        chunk,
+                    ))
+        elapsed = max(time.time() - started, 1e-6)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {rows} ({rows / elapsed:.0f} строк/с), '
+            f'картинок: {copied}'
+        ))
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import write_transaction
+from posts import transfer
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return int(checkpoint.read())
+    except FileNotFoundError:
+        return 0
+    except ValueError:
+        raise CommandError(f'Повреждён файл контрольной точки {path}')
+
+
+def write_checkpoint(path, lines):
+    with open(path + '.tmp', 'w') as checkpoint:
+        checkpoint.write(str(lines))
+    os.replace(path + '.tmp', path)
+
+
+class Command(BaseCommand):
+    help = 'Загружает NDJSON из posts_export пачками в транзакциях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TRANSFER_BATCH_SIZE,
+            help='Строк в одной транзакции',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <input>.checkpoint',
+        )
+        parser.add_argument(
+            '--media',
+            help='Каталог с картинками, выгруженными posts_export',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.TRANSFER_MEDIA_WORKERS,
+            help='Число потоков копирования картинок',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or options['input'] + '.checkpoint'
+        done = read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f'Продолжение со строки {done + 1}')
+        source = options['media'] and FileSystemStorage(
+            location=options['media']
+        )
+        started = time.time()
+        rows = 0
+        totals = Counter()
+        with open(options['input'], encoding='utf-8') as lines, \
+                ThreadPoolExecutor(max_workers=options['workers']) as pool, \
+                transfer.keep_dates():
+            lines = islice(lines, done, None)
+            while True:
+                batch = [
+                    json.loads(line)
+                    for line in islice(lines, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                copies = []
+                if source:
+                    copies = [
+                        pool.submit(transfer.copy_media, record['image'],
+                                    source, default_storage)
+                        for record in batch
+                        if record['model'] == 'post' and record['image']
+                    ]
+                with write_transaction():
+                    totals += transfer.import_batch(batch)
+                for copy in copies:
+                    copy.result()
+                rows += len(batch)
+                write_checkpoint(checkpoint, done + rows)
+                elapsed = max(time.time() - started, 1e-6)
+                self.stdout.write(
+                    f'Строк: {done + rows} ({rows / elapsed:.0f} строк/с)'
+                )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = max(time.time() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {rows} ({rows / elapsed:.0f} строк/с), '
+            f'новых объектов: {totals["created"]}'
+        ))
+        if totals['conflicts']:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено строк с занятыми ключами постов: '
+                f'{totals["conflicts"]}'
+            ))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярной ленты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все посты окна, а не только изменившиеся',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Пересчитывать по кругу, а не один раз',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=settings.RANKING_INTERVAL,
+            help='Пауза между проходами в секундах',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            updated, removed = ranking.rank(full=full)
+            self.stdout.write(
+                f'Обновлено рейтингов: {updated}, удалено: {removed}'
+            )
+            if not options['loop']:
+                break
+            full = False
+            close_old_connections()
+            time.sleep(options['interval'])
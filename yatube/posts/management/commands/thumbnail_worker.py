@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+
+
+def process(pk):
+    try:
+        return thumbnails.process(pk)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков в пуле',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                thumbnails.release_stale()
+                batch = thumbnails.claim(settings.THUMBNAIL_BATCH_SIZE)
+                if batch:
+                    statuses = list(pool.map(process, batch))
+                    done += len(statuses)
+                    self.stdout.write(
+                        f'Обработано миниатюр: {len(statuses)}'
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Всего миниатюр: {done}'))
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_existing(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Thumbnail = apps.get_model('posts', 'Thumbnail')
+    posts = Post.objects.exclude(image='').values_list('pk', flat=True)
+    for pk in posts.iterator():
+        Thumbnail.objects.create(
+            post_id=pk, geometry='1000x1000', status='pending'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geometry', models.CharField(max_length=32, verbose_name='Размер')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('url', models.CharField(blank=True, max_length=255, verbose_name='Адрес')),
+                ('width', models.PositiveIntegerField(null=True, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(null=True, verbose_name='Высота')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Миниатюра',
+                'verbose_name_plural': 'Миниатюры',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='thumbnail',
+            index=models.Index(fields=['status', 'updated'], name='thumbnail_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('post', 'geometry'), name='thumbnail_unique'),
+        ),
+        migrations.RunPython(enqueue_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:24
+
+from django.conf import settings
+from django.db import migrations, models
+from PIL import Image
+
+
+def enqueue_variants(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Thumbnail = apps.get_model('posts', 'Thumbnail')
+    Thumbnail.objects.all().delete()
+    Image.init()
+    formats = [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE or image_format == 'JPEG'
+    ]
+    posts = Post.objects.exclude(image='').values_list('pk', flat=True)
+    for pk in posts.iterator():
+        Thumbnail.objects.bulk_create(
+            Thumbnail(
+                post_id=pk,
+                geometry=str(width),
+                format=image_format,
+                status='pending',
+            )
+            for width in settings.POST_IMAGE_WIDTHS
+            for image_format in formats
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='thumbnail',
+            name='thumbnail_unique',
+        ),
+        migrations.AddField(
+            model_name='thumbnail',
+            name='format',
+            field=models.CharField(default='JPEG', max_length=8, verbose_name='Формат'),
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('post', 'geometry', 'format'), name='thumbnail_variant_unique'),
+        ),
+        migrations.RunPython(enqueue_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:26
+
+from collections import Counter
+import re
+
+from django.db import OperationalError, migrations, models, transaction
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_fts(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                "text, tokenize='unicode61 remove_diacritics 2')"
+            )
+    except OperationalError:
+        return False
+    return True
+
+
+def build_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    if create_fts(schema_editor):
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        return
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        tokens = re.findall(r'\w+', text.lower().replace('ё', 'е'))
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term[:64], post_id=pk, weight=n)
+            for term, n in Counter(
+                token for token in tokens if len(token) >= 2
+            ).items()
+        )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_image_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='search_term_unique'),
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -28,6 +28,13 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('author', 'group').prefetch_related(
+            'thumbnails'
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -37,6 +44,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -58,11 +69,39 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name='Хэш картинки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:TEXT_LIMIT]
@@ -96,6 +135,12 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:TEXT_LIMIT]
@@ -118,9 +163,220 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
-        models.UniqueConstraint(
-            fields=('user', 'author'),
-            name='following'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='following'
+            ),
+        )
+
+
+class Thumbnail(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (READY, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnails',
+        verbose_name='Пост'
+    )
+    geometry = models.CharField(
+        max_length=32,
+        verbose_name='Размер',
+    )
+    format = models.CharField(
+        max_length=8,
+        default='JPEG',
+        verbose_name='Формат',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    url = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Адрес',
+    )
+    width = models.PositiveIntegerField(
+        null=True,
+        verbose_name='Ширина',
+    )
+    height = models.PositiveIntegerField(
+        null=True,
+        verbose_name='Высота',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменено',
+    )
+
+    class Meta:
+        verbose_name = 'Миниатюра'
+        verbose_name_plural = 'Миниатюры'
+        indexes = (
+            models.Index(
+                fields=('status', 'updated'),
+                name='thumbnail_queue_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'geometry', 'format'),
+                name='thumbnail_variant_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post_id} {self.geometry} {self.format}'
+
+
+class SearchTerm(models.Model):
+    TERM_LENGTH = 64
+
+    term = models.CharField(
+        max_length=TERM_LENGTH,
+        verbose_name='Слово',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    weight = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Число вхождений',
+    )
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('term', 'post'),
+                name='search_term_unique'
+            ),
+        )
+
+    def __str__(self):
+        return self.term
+
+
+class PostScore(models.Model):
+    """Место поста в популярной ленте, считает manage.py rank_posts."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Пост'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Группа',
+    )
+    score = models.FloatField(
+        verbose_name='Рейтинг',
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев при расчёте',
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков автора при расчёте',
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = (
+            models.Index(fields=('-score',), name='post_score_idx'),
+            models.Index(
+                fields=('group', '-score'),
+                name='post_score_group_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.3f}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_date_post_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='feed_entry_unique'
+            ),
         )
 
 
@@ -0,0 +1,112 @@
+"""Популярная лента: рейтинг постов с затуханием по времени.
+
+Вес поста — комментарии и подписчики автора, и он вдвое падает каждые
+RANKING_HALF_LIFE секунд. Вместо weight * 2 ** (-age / half_life)
+хранится log2(weight) + pub_date / half_life: порядок постов тот же,
+но рейтинг не зависит от текущего времени. Поэтому manage.py rank_posts
+пересчитывает только посты, у которых изменились комментарии, группа
+или число подписчиков автора, а запрос страницы лишь читает первые
+RANKING_TOP_K строк таблицы PostScore по индексу.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.db import write_transaction
+
+from . import cache
+from .models import Post, PostScore
+
+
+def score(comments, followers, pub_date):
+    weight = (
+        1 + comments * settings.RANKING_COMMENT_WEIGHT
+        + followers * settings.RANKING_FOLLOWER_WEIGHT
+    )
+    return (
+        math.log2(weight)
+        + pub_date.timestamp() / settings.RANKING_HALF_LIFE
+    )
+
+
+def window_start():
+    return timezone.now() - timedelta(seconds=settings.RANKING_WINDOW)
+
+
+def stale_posts(full=False):
+    """Посты окна, для которых рейтинга нет или он устарел."""
+    posts = Post.objects.filter(pub_date__gte=window_start()).annotate(
+        followers=Coalesce('author__stats__followers_count', 0),
+    )
+    if not full:
+        posts = posts.annotate(
+            ranked_group=Coalesce('score__group', 0),
+            current_group=Coalesce('group', 0),
+        ).filter(
+            Q(score__isnull=True)
+            | ~Q(score__comments_count=F('comments_count'))
+            | ~Q(score__followers_count=F('followers'))
+            | ~Q(ranked_group=F('current_group'))
+        )
+    return posts.order_by('pk').values_list(
+        'pk', 'group_id', 'comments_count', 'followers', 'pub_date'
+    )
+
+
+def save_scores(rows):
+    scores = [
+        PostScore(
+            post_id=pk,
+            group_id=group_id,
+            score=score(comments, followers, pub_date),
+            comments_count=comments,
+            followers_count=followers,
+        )
+        for pk, group_id, comments, followers, pub_date in rows
+    ]
+    existing = set(PostScore.objects.filter(
+        pk__in=[item.post_id for item in scores]
+    ).values_list('pk', flat=True))
+    with write_transaction():
+        PostScore.objects.bulk_create(
+            item for item in scores if item.post_id not in existing
+        )
+        PostScore.objects.bulk_update(
+            [item for item in scores if item.post_id in existing],
+            ('group', 'score', 'comments_count', 'followers_count'),
+        )
+
+
+def rank(full=False, batch_size=None):
+    """Пересчитывает устаревшие рейтинги, возвращает (обновлено, удалено)."""
+    batch_size = batch_size or settings.RANKING_BATCH_SIZE
+    updated = last = 0
+    while True:
+        batch = list(stale_posts(full).filter(pk__gt=last)[:batch_size])
+        if not batch:
+            break
+        save_scores(batch)
+        updated += len(batch)
+        last = batch[-1][0]
+    removed, _ = PostScore.objects.filter(
+        post__pub_date__lt=window_start()
+    ).delete()
+    if updated or removed:
+        cache.bump(cache.ranking_scope())
+    return updated, removed
+
+
+def popular(group=None):
+    """Первые RANKING_TOP_K постов популярной ленты."""
+    scores = PostScore.objects.all()
+    if group is not None:
+        scores = scores.filter(group=group)
+    top = list(scores.order_by('-score').values_list(
+        'post_id', flat=True
+    )[:settings.RANKING_TOP_K])
+    posts = Post.objects.for_feed().in_bulk(top)
+    return [posts[pk] for pk in top if pk in posts]
@@ -0,0 +1,98 @@
+"""Полнотекстовый поиск по постам через инвертированный индекс.
+
+На SQLite со сборкой FTS5 индекс — виртуальная таблица posts_post_fts
+(rowid = id поста), ранжирование по bm25. Иначе используется таблица
+SearchTerm: терм, пост и число вхождений, ранжирование по сумме
+вхождений всех слов запроса. Индекс обновляют сигналы Post.
+"""
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, FloatField, Q, Sum, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_QUERY_TOKENS = 8
+
+_fts_enabled = None
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+
+def fts_enabled():
+    global _fts_enabled
+    if _fts_enabled is None:
+        _fts_enabled = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_enabled
+
+
+def index_post(post):
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+        return
+    SearchTerm.objects.filter(post=post).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term[:SearchTerm.TERM_LENGTH], post=post, weight=n)
+        for term, n in Counter(tokenize(post.text)).items()
+    )
+
+
+def remove_post(post_id):
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+    # Строки SearchTerm удаляются каскадом вместе с постом
+
+
+def search(query):
+    """Посты, где встречаются все слова запроса, с аннотацией rank.
+
+    Чем больше rank, тем выше пост в выдаче.
+    """
+    terms = tokenize(query)[:MAX_QUERY_TOKENS]
+    if not terms:
+        return Post.objects.none().annotate(
+            rank=Value(0, output_field=FloatField())
+        )
+    if fts_enabled():
+        match = ' '.join('"{}"'.format(term) for term in terms)
+        # Индекс присоединяется к постам один раз: bm25() считается по
+        # той же выборке MATCH, а не подзапросом на каждую строку
+        return Post.objects.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = posts_post.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        ).annotate(
+            rank=RawSQL(f'-bm25({FTS_TABLE})', [], output_field=FloatField())
+        )
+    terms = [term[:SearchTerm.TERM_LENGTH] for term in set(terms)]
+    matched = Q(search_terms__term__in=terms)
+    return Post.objects.annotate(
+        matched_terms=Count('search_terms', filter=matched),
+        rank=Sum('search_terms__weight', filter=matched),
+    ).filter(matched_terms=len(terms))
@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, feed, graph, search, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+NAME_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, posts_count=1)
+        feed.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+        feed.backfill(instance.user_id, (instance.author_id,))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, following_count=-1)
+    counters.change_user(instance.author_id, followers_count=-1)
+    feed.prune(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._old_group_slug, instance._old_image = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image'
+        ).first() or (None, None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def enqueue_thumbnails(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.image.name != instance._old_image:
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    scopes = cache.post_scopes(instance)
+    old_slug = getattr(instance, '_old_group_slug', None)
+    if old_slug:
+        scopes.append(cache.group_scope(old_slug))
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    cache.bump(cache.post_scope(instance.post_id), cache.comments_scope())
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    cache.bump(
+        cache.author_scope(instance.author.username),
+        cache.author_scope(instance.user.username),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def graph_edge_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: graph.edge_added(
+            instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Follow)
+def graph_edge_removed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: graph.edge_removed(
+        instance.user_id, instance.author_id
+    ))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    cache.bump(cache.groups_scope(), cache.group_scope(instance.slug))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._old_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields=None,
+                      **kwargs):
+    if created:
+        cache.bump(cache.author_scope(instance.username))
+        return
+    if update_fields and not NAME_FIELDS & set(update_fields):
+        return
+    slugs = Group.objects.filter(
+        posts__author=instance
+    ).values_list('slug', flat=True).distinct()
+    scopes = [cache.feed_scope(), cache.author_scope(instance.username)]
+    old_username = getattr(instance, '_old_username', None)
+    if old_username and old_username != instance.username:
+        scopes.append(cache.author_scope(old_username))
+    cache.bump(*scopes, *(cache.group_scope(slug) for slug in slugs))
@@ -0,0 +1,42 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import profiling
+
+from .. import cache
+from ..models import Thumbnail
+
+register = template.Library()
+
+
+def thumbnails_pending(post):
+    return bool(post.image) and any(
+        item.status not in (Thumbnail.READY, Thumbnail.FAILED)
+        for item in post.thumbnails.all()
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Пары (пост, карточка) страницы ленты.
+
+    Готовые карточки читаются из кэша одним запросом, недостающие
+    рисуются и сохраняются. Карточки с неготовыми миниатюрами не
+    кэшируются, чтобы картинка появилась, как только они будут готовы.
+    """
+    posts = list(posts)
+    cards = cache.get_cards(posts)
+    profiling.count('card_hit', len(cards))
+    profiling.count('card_miss', len(posts) - len(cards))
+    rendered = {}
+    for post in posts:
+        if post.pk in cards:
+            continue
+        cards[post.pk] = render_to_string(
+            'includes/post_author.html', {'post': post}
+        )
+        if not thumbnails_pending(post):
+            rendered[post] = cards[post.pk]
+    cache.set_cards(rendered)
+    return [(post, mark_safe(cards[post.pk])) for post in posts]
@@ -0,0 +1,61 @@
+from django import template
+from django.conf import settings
+
+from core import profiling
+
+from ..models import Thumbnail
+from ..thumbnails import FALLBACK_FORMAT, MIME_TYPES, supported_formats
+
+register = template.Library()
+
+
+def srcset(variants):
+    return ', '.join(f'{item.url} {item.width}w' for item in variants)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes=None):
+    """<picture> с вариантами картинки или заглушка, пока они не готовы.
+
+    Если ни один вариант JPEG не удалось собрать, показывается исходная
+    картинка: ждать больше нечего.
+    """
+    context = {'post': post, 'sizes': sizes or settings.POST_IMAGE_SIZES}
+    if not post.image:
+        return context
+    with profiling.timer('thumbnails'):
+        return image_context(post, context)
+
+
+def image_context(post, context):
+    ready = {}
+    pending = False
+    for item in post.thumbnails.all():
+        if item.status == Thumbnail.READY:
+            ready.setdefault(item.format, {}).setdefault(item.width, item)
+        elif item.status != Thumbnail.FAILED:
+            pending = pending or item.format == FALLBACK_FORMAT
+    fallback = sorted(
+        ready.get(FALLBACK_FORMAT, {}).values(), key=lambda item: item.width
+    )
+    context['pending'] = pending
+    if pending:
+        profiling.count('thumbnails_pending')
+        return context
+    if not fallback:
+        profiling.count('thumbnails_failed')
+        context['original'] = True
+        return context
+    context['sources'] = [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': srcset(sorted(
+                ready[image_format].values(), key=lambda item: item.width
+            )),
+        }
+        for image_format in supported_formats()
+        if image_format != FALLBACK_FORMAT and image_format in ready
+    ]
+    context['image'] = fallback[-1]
+    context['srcset'] = srcset(fallback)
+    return context
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+
+from ..cache import bump, cache_feed, get_versions
+
+THREADS = 8
+
+
+class CacheFeedStampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+        @cache_feed(lambda request: ('stampede',), timeout=1, beta=0)
+        def slow_view(request):
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            return HttpResponse(f'Версия {self.calls}')
+
+        self.view = slow_view
+
+    def tearDown(self):
+        cache.clear()
+
+    def hit_concurrently(self):
+        barrier = threading.Barrier(THREADS)
+        responses = []
+
+        def worker():
+            barrier.wait()
+            responses.append(self.view(self.factory.get('/')))
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_cold_cache_is_generated_once(self):
+        responses = self.hit_concurrently()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(responses), THREADS)
+        for response in responses:
+            self.assertEqual(response.content.decode(), 'Версия 1')
+
+    def test_expired_entry_is_regenerated_once(self):
+        self.view(self.factory.get('/'))
+        time.sleep(1.1)
+        responses = self.hit_concurrently()
+        self.assertEqual(self.calls, 2)
+        contents = {response.content.decode() for response in responses}
+        self.assertLessEqual(contents, {'Версия 1', 'Версия 2'})
+        self.assertEqual(
+            self.view(self.factory.get('/')).content.decode(), 'Версия 2'
+        )
+
+    def test_other_session_does_not_wait_for_foreign_lock(self):
+        barrier = threading.Barrier(2)
+        timings = {}
+
+        def worker(cookie):
+            barrier.wait()
+            started = time.perf_counter()
+            self.view(self.factory.get('/', HTTP_COOKIE=cookie))
+            timings[cookie] = time.perf_counter() - started
+
+        threads = [
+            threading.Thread(target=worker, args=(cookie,))
+            for cookie in ('sessionid=first', 'sessionid=second')
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 2)
+        for elapsed in timings.values():
+            self.assertLess(elapsed, 1)
+
+
+class BumpTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bump_in_transaction_repeats_after_commit(self):
+        before = get_versions(['scope'])
+        with transaction.atomic():
+            bump('scope')
+            during = get_versions(['scope'])
+            self.assertNotEqual(during, before)
+        self.assertNotEqual(get_versions(['scope']), during)
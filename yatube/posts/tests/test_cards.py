@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Group, Post, Thumbnail, User
+from ..templatetags import post_cards
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            username='UserTest', first_name='Имя', last_name='Фамилия'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+        Post.objects.create(text='Второй пост', author=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def cards(self):
+        return dict(post_cards.post_cards(Post.objects.for_feed()))
+
+    def card(self):
+        return next(
+            card for post, card in self.cards().items()
+            if post.pk == self.post.pk
+        )
+
+    def test_page_is_one_cache_read(self):
+        self.cards()
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many, mock.patch.object(
+            post_cards, 'render_to_string'
+        ) as render:
+            cards = self.cards()
+        get_many.assert_called_once()
+        render.assert_not_called()
+        self.assertEqual(len(cards), 2)
+        self.assertIn('Тестовый пост', self.card())
+
+    def test_edit_and_renames_change_card(self):
+        self.card()
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertIn('Исправленный пост', self.card())
+        self.user.first_name = 'Новое'
+        self.user.save()
+        self.assertIn('Новое Фамилия', self.card())
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        key = post_cards.cache.card_key(post)
+        self.group.title = 'Новое название'
+        self.group.save()
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        self.assertNotEqual(post_cards.cache.card_key(post), key)
+
+    def test_card_with_pending_thumbnails_is_not_cached(self):
+        self.post.image = 'posts/test.jpg'
+        self.post.save()
+        self.assertTrue(self.post.thumbnails.exists())
+        self.cards()
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        self.assertEqual(cache.get_many([post_cards.cache.card_key(post)]),
+                         {})
+        self.post.thumbnails.update(status=Thumbnail.READY)
+        self.cards()
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        self.assertIsNotNone(cache.get(post_cards.cache.card_key(post)))
@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import comment_queue
+from ..cache import add_pending, pending_comments
+from ..models import Comment, Post, User
+
+QUEUE_DIR = tempfile.mkdtemp()
+THREADS = 8
+
+
+@override_settings(COMMENT_QUEUE_ENABLED=True, COMMENT_QUEUE_DIR=QUEUE_DIR,
+                   COMMENT_QUEUE_FSYNC=False)
+class CommentQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+        cls.reader = User.objects.create(username='ReaderTest')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='Тестовый пост', author=self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def tearDown(self):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+
+    def comment(self, text):
+        return self.reader_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': text},
+        )
+
+    def test_comment_waits_in_queue_and_is_shown_to_author(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.author_client.get(url)
+        with self.assertNumQueries(3):
+            self.comment('Из очереди')
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(self.reader_client.get(url), 'Из очереди')
+        self.assertNotContains(self.author_client.get(url), 'Из очереди')
+
+    def test_flush_saves_comments_once(self):
+        for i in range(5):
+            self.comment(f'Комментарий {i}')
+        out = StringIO()
+        call_command('flush_comments', '--once', stdout=out)
+        self.assertIn('Всего комментариев: 5', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        self.assertEqual(
+            list(Comment.objects.order_by('created').values_list(
+                'text', flat=True
+            )),
+            [f'Комментарий {i}' for i in range(5)],
+        )
+        self.assertEqual(
+            cache.get(f'comments.pending.{self.post.pk}.{self.reader.pk}'),
+            None,
+        )
+        response = self.author_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, 'Комментарий 4')
+        self.assertEqual(comment_queue.flush(), 0)
+
+    def test_replayed_file_does_not_duplicate(self):
+        self.comment('Один раз')
+        path = comment_queue.rotate()[0]
+        backup = path + '.copy'
+        shutil.copy(path, backup)
+        self.assertEqual(comment_queue.flush(), 1)
+        os.rename(backup, path)
+        with open(path, 'a') as queue:
+            queue.write('{"key": "обрыв')
+        with self.assertLogs('posts.comment_queue', 'WARNING'):
+            self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(os.listdir(QUEUE_DIR), ['comments.lock'])
+
+    def test_comments_to_deleted_posts_are_dropped(self):
+        self.comment('В пустоту')
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(comment_queue.flush(), 0)
+
+    def test_comments_of_deleted_authors_are_dropped(self):
+        gone = User.objects.create(username='GoneTest')
+        comment_queue.enqueue(self.post.pk, gone.pk, 'Без автора')
+        self.comment('С автором')
+        gone.delete()
+        self.assertEqual(comment_queue.flush(), 1)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['С автором'],
+        )
+
+    def test_failed_batch_is_quarantined(self):
+        self.comment('Не записан')
+        with mock.patch.object(
+            comment_queue, 'save_batch', side_effect=IntegrityError
+        ), self.assertLogs('posts.comment_queue', 'ERROR'):
+            self.assertEqual(comment_queue.flush(), 0)
+        failed = [
+            name for name in os.listdir(QUEUE_DIR)
+            if name.endswith(comment_queue.FAILED_SUFFIX)
+        ]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(comment_queue.rotate(), [])
+        self.comment('Записан')
+        self.assertEqual(comment_queue.flush(), 1)
+
+    def test_concurrent_pending_comments_are_kept(self):
+        barrier = threading.Barrier(THREADS)
+
+        def add(number):
+            barrier.wait()
+            add_pending({
+                'key': str(number), 'post': self.post.pk,
+                'author': self.reader.pk, 'text': str(number),
+            })
+
+        threads = [
+            threading.Thread(target=add, args=(number,))
+            for number in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            len(pending_comments(self.post.pk, self.reader.pk)),
+            THREADS,
+        )
+
+    def test_queue_requires_shared_cache(self):
+        self.assertEqual(
+            [error.id for error in comment_queue.check_shared_cache(None)],
+            ['posts.E001'],
+        )
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache',
+        }}):
+            self.assertEqual(comment_queue.check_shared_cache(None), [])
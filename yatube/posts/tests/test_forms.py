@@ -1,17 +1,21 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import thumbnails
 from ..forms import PostForm
-from ..models import Comment, Group, Post, User
+from ..models import Comment, Group, Post, Thumbnail, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_ORIENTATION = 0x0112
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -127,6 +131,116 @@ class PostFormTests(TestCase):
                 image='posts/small_1.gif'
             ).exists())
 
+    def test_image_thumbnails_prepared_in_background(self):
+        uploaded = SimpleUploadedFile(
+            name='small_2.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.assertEqual(
+            set(post.thumbnails.values_list('geometry', 'format', 'status')),
+            {(geometry, image_format, Thumbnail.PENDING)
+             for geometry, image_format in thumbnails.variants()},
+        )
+        self.assertContains(
+            self.authorized_user.get(url), 'Изображение обрабатывается'
+        )
+        for pk in thumbnails.claim(settings.THUMBNAIL_BATCH_SIZE):
+            self.assertEqual(thumbnails.process(pk), Thumbnail.READY)
+        response = self.authorized_user.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        for thumbnail in post.thumbnails.all():
+            with self.subTest(thumbnail=thumbnail):
+                self.assertContains(
+                    response, f'{thumbnail.url} {thumbnail.width}w'
+                )
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_failed_thumbnails_show_original_image(self):
+        uploaded = SimpleUploadedFile(
+            name='small_3.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с битой картинкой', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Пост с битой картинкой')
+        post.thumbnails.update(status=Thumbnail.FAILED)
+        response = self.authorized_user.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, f'src="{post.image.url}"')
+
+    @staticmethod
+    def jpeg_upload(name, size, exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size, color='red')
+        options = {'exif': exif.tobytes()} if exif is not None else {}
+        image.save(buffer, 'JPEG', **options)
+        return SimpleUploadedFile(
+            name=name, content=buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def create_with_image(self, text, upload):
+        return self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={'text': text, 'image': upload},
+        )
+
+    def test_upload_is_rotated_by_exif_and_stripped(self):
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        self.create_with_image(
+            'Повёрнутая картинка',
+            self.jpeg_upload('photo.jpg', (40, 20), exif),
+        )
+        post = Post.objects.get(text='Повёрнутая картинка')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertNotIn(EXIF_ORIENTATION, stored.getexif())
+        self.assertEqual(len(post.image_hash), 64)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=30)
+    def test_upload_resolution_is_capped(self):
+        self.create_with_image(
+            'Большая картинка', self.jpeg_upload('big.jpg', (90, 60))
+        )
+        post = Post.objects.get(text='Большая картинка')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (30, 20))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_upload_with_too_many_pixels_is_rejected(self):
+        response = self.create_with_image(
+            'Огромная картинка', self.jpeg_upload('huge.jpg', (20, 20))
+        )
+        self.assertFalse(
+            Post.objects.filter(text='Огромная картинка').exists()
+        )
+        self.assertTrue(response.context['form'].has_error('image'))
+
+    def test_duplicate_upload_reuses_stored_file(self):
+        self.create_with_image(
+            'Оригинал', self.jpeg_upload('first.jpg', (10, 10))
+        )
+        self.create_with_image(
+            'Копия', self.jpeg_upload('second.jpg', (10, 10))
+        )
+        original = Post.objects.get(text='Оригинал')
+        copy = Post.objects.get(text='Копия')
+        self.assertEqual(copy.image_hash, original.image_hash)
+        self.assertEqual(copy.image.name, original.image.name)
+
     def test_unauthorized_user_create_post(self):
         posts_count = Post.objects.count()
         form_data = {
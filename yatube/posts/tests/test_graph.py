@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from .. import graph, graph_benchmark
+from ..models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        self.graph = graph.FollowGraph(shards=4)
+        self.graph.load([(1, 2), (1, 3), (2, 1), (3, 4), (2, 4), (1, 2)])
+        self.graph.finish()
+
+    def test_load_sorts_and_removes_duplicates(self):
+        self.assertEqual(self.graph.edges, 5)
+        self.assertEqual(list(self.graph.following(1)), [2, 3])
+        self.assertEqual(list(self.graph.followers(4)), [2, 3])
+        self.assertEqual(list(self.graph.following(99)), [])
+
+    def test_add_and_remove(self):
+        self.graph.add(4, 1)
+        self.graph.add(4, 1)
+        self.assertEqual(self.graph.edges, 6)
+        self.assertTrue(self.graph.follows(4, 1))
+        self.assertEqual(list(self.graph.followers(1)), [2, 4])
+        self.graph.remove(4, 1)
+        self.graph.remove(4, 1)
+        self.assertEqual(self.graph.edges, 5)
+        self.assertEqual(list(self.graph.following(4)), [])
+
+    def test_mutual_and_suggested(self):
+        self.assertEqual(self.graph.mutual(1), [2])
+        self.assertEqual(self.graph.suggested(1, limit=5), [4])
+
+    def test_benchmark_runs(self):
+        results = graph_benchmark.benchmark(
+            users=200, edges=2000, queries=20, seed=1
+        )
+        self.assertGreater(results['edges'], 0)
+        self.assertIn('p99_us', results['suggested'])
+
+
+class GraphSignalsTests(TransactionTestCase):
+    def setUp(self):
+        graph.reset()
+        self.user = User.objects.create(username='UserTest')
+        self.author = User.objects.create(username='AuthorTest')
+
+    def tearDown(self):
+        graph.reset()
+
+    def test_graph_follows_commits(self):
+        follow_graph = graph.get_graph()
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            list(follow_graph.following(self.user.pk)), [self.author.pk]
+        )
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(list(follow_graph.following(self.user.pk)), [])
+
+    def test_changes_during_rebuild_are_replayed(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        graph.get_graph()
+        build = graph.build
+
+        def build_then_unfollow():
+            snapshot = build()
+            Follow.objects.filter(user=self.user).delete()
+            Follow.objects.create(user=self.author, author=self.user)
+            return snapshot
+
+        with mock.patch.object(graph, 'build', build_then_unfollow):
+            graph.rebuild()
+        follow_graph = graph.get_graph()
+        self.assertFalse(follow_graph.follows(self.user.pk, self.author.pk))
+        self.assertTrue(follow_graph.follows(self.author.pk, self.user.pk))
+
+    def test_preload_builds_graph(self):
+        graph.preload()
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(graph.get_graph())
+
+
+class FollowPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='AuthorTest')
+        cls.friend = User.objects.create(username='FriendTest')
+        cls.fan = User.objects.create(username='FanTest')
+        cls.other = User.objects.create(username='OtherTest')
+        Follow.objects.bulk_create([
+            Follow(user=cls.friend, author=cls.author),
+            Follow(user=cls.author, author=cls.friend),
+            Follow(user=cls.fan, author=cls.author),
+            Follow(user=cls.fan, author=cls.friend),
+            Follow(user=cls.friend, author=cls.other),
+        ])
+
+    def setUp(self):
+        graph.reset()
+        self.guest_user = Client()
+        self.fan_client = Client()
+        self.fan_client.force_login(self.fan)
+
+    def tearDown(self):
+        graph.reset()
+
+    def check_lists(self):
+        response = self.guest_user.get(
+            reverse('posts:followers', args=[self.author.username])
+        )
+        self.assertEqual(response.context['users'], [self.friend, self.fan])
+        self.assertEqual(response.context['mutual'], {self.friend.pk})
+        self.assertContains(response, 'взаимно', count=1)
+        response = self.guest_user.get(
+            reverse('posts:following', args=[self.fan.username])
+        )
+        self.assertEqual(
+            response.context['users'], [self.author, self.friend]
+        )
+
+    def test_lists_from_graph(self):
+        self.check_lists()
+        self.assertIsNotNone(graph.get_graph())
+
+    @override_settings(FOLLOW_GRAPH_MAX_EDGES=1)
+    def test_lists_without_graph(self):
+        with self.assertLogs('posts.graph', 'WARNING'):
+            self.check_lists()
+        self.assertIsNone(graph.get_graph())
+
+    def test_etag_changes_with_graph_rebuild(self):
+        url = reverse('posts:followers', args=[self.author.username])
+        etag = self.guest_user.get(url)['ETag']
+        response = self.guest_user.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        graph.rebuild()
+        response = self.guest_user.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_suggested_authors(self):
+        url = reverse('posts:suggested_authors')
+        response = self.fan_client.get(url)
+        self.assertEqual(response.context['users'], [self.other])
+        response = self.guest_user.get(url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_suggested_falls_back_to_popular_authors(self):
+        client = Client()
+        client.force_login(self.other)
+        response = client.get(reverse('posts:suggested_authors'))
+        self.assertEqual(response.context['users'][0], self.author)
+        self.assertNotIn(self.other, response.context['users'])
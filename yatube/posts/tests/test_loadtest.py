@@ -0,0 +1,79 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import loadtest
+from ..models import FeedEntry, Follow, Post, User
+
+
+class GenerateDataTests(TestCase):
+    def test_generate_creates_consistent_data(self):
+        call_command(
+            'generate_data', users=30, posts=200, groups=3, follows=5,
+            comments=50, seed=1, batch_size=64, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        author = User.objects.get(username='user0')
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+        self.assertGreater(author.posts.count(), 200 / 30)
+        self.assertEqual(
+            author.stats.followers_count, author.following.count()
+        )
+        follow = Follow.objects.first()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=follow.user, post__author=follow.author
+        ).exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 50
+        )
+
+    def test_zipf_prefers_first_items(self):
+        sample = loadtest.Zipf(range(10), 1.1, random.Random(0))
+        picks = sample.sample(1000)
+        self.assertGreater(picks.count(0), picks.count(9) * 5)
+
+
+class BenchmarkViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_benchmark_saves_and_compares_baseline(self):
+        loadtest.generate(
+            users=5, posts=20, comments=5, seed=2, log=lambda message: None
+        )
+        baseline = os.path.join(self.temp_dir, 'baseline.json')
+        call_command(
+            'benchmark_views', requests=3, warmup=0, output=baseline,
+            stdout=StringIO(),
+        )
+        with open(baseline, encoding='utf-8') as file:
+            views = json.load(file)['views']
+        self.assertEqual(set(views), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index',
+        })
+        for name, metrics in views.items():
+            with self.subTest(view=name):
+                self.assertEqual(metrics['status'], 200)
+                self.assertGreater(metrics['queries'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        out = StringIO()
+        call_command(
+            'benchmark_views', requests=3, warmup=0, compare=baseline,
+            view=['index'], stdout=out,
+        )
+        self.assertIn('p50_ms', out.getvalue())
@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import TEXT_LIMIT, Group, Post, User
+from ..models import (TEXT_LIMIT, Comment, Follow, Group, Post, User,
+                      UserStats)
 
 
 class PostModelTest(TestCase):
@@ -49,3 +53,44 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertStats(self.user, posts_count=1, followers_count=1)
+        self.assertStats(self.reader, following_count=1)
+
+        post.comments.all().delete()
+        Follow.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertStats(self.user, posts_count=0, followers_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_recount_counters_fixes_drift(self):
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertStats(self.user, posts_count=1)
@@ -0,0 +1,246 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import cache as posts_cache
+from ..models import Comment, Follow, Group, Post, User
+
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_feedentry')
+
+
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+            for i in range(30)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.reader)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_user.get(url)
+        plans = []
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            if not any(f'"{table}"' in query['sql'] for table in FEED_TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append([row[-1] for row in cursor.fetchall()])
+        return plans
+
+    def test_feed_views_use_index_scans(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            plans = self.query_plans(url)
+            self.assertTrue(plans)
+            for plan in plans:
+                with self.subTest(url=url, plan=plan):
+                    for step in plan:
+                        if any(table in step for table in FEED_TABLES):
+                            self.assertIn('USING', step)
+                    self.assertFalse(
+                        any('TEMP B-TREE' in step for step in plan)
+                    )
+
+
+class QueryCountTests(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+
+    # В group_list, profile и post_detail один запрос — Last-Modified
+    MAX_QUERIES = {
+        'posts:index': 4,
+        'posts:group_list': 6,
+        'posts:profile': 7,
+        'posts:post_detail': 6,
+        'posts:follow_index': 5,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.reader)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def fill(self, count):
+        author = User.objects.create(
+            username=f'Author{count}', first_name='Имя', last_name='Фамилия'
+        )
+        Follow.objects.create(user=self.reader, author=author)
+        posts = [
+            Post.objects.create(
+                text=f'Тестовый пост {i}', author=author, group=self.group
+            )
+            for i in range(count)
+        ]
+        for post in posts:
+            Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Comment.objects.create(post=posts[0], author=author, text='Ответ')
+        return author, posts[0]
+
+    def urls(self, author, post):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[self.group.slug]
+            ),
+            'posts:profile': reverse('posts:profile', args=[author.username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[post.pk]
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_user.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        small = self.urls(*self.fill(1))
+        small_counts = {
+            name: self.count_queries(url) for name, url in small.items()
+        }
+        large = self.urls(*self.fill(settings.PAGE_LIM * 2))
+        for name, url in large.items():
+            with self.subTest(page=name):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, small_counts[name])
+                self.assertLessEqual(queries, self.MAX_QUERIES[name])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group
+        )
+        self.urls = (
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_repeat_request_is_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(1):
+                    repeat = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat.content, b'')
+                repeat = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(repeat.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        etags = {
+            url: self.guest_client.get(url)['ETag'] for url in self.urls
+        }
+        self.post.text = 'Новый текст'
+        self.post.save()
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый текст')
+
+    def test_author_rename_invalidates_post_detail(self):
+        url = self.urls[-1]
+        etag = self.guest_client.get(url)['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Переименован'
+        user.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Переименован')
+
+    def test_follow_changes_last_modified(self):
+        url = self.urls[1]
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        reader = User.objects.create(username='Reader')
+        # Last-Modified считается в секундах
+        with mock.patch.object(
+            posts_cache.time, 'time', return_value=time.time() + 5
+        ):
+            Follow.objects.create(user=reader, author=self.user)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_validators_depend_on_session(self):
+        url = self.urls[-1]
+        etag = self.guest_client.get(url)['ETag']
+        authorized_user = Client()
+        authorized_user.force_login(self.user)
+        response = authorized_user.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import ranking
+from ..models import Comment, Follow, Group, Post, PostScore, User
+
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='AuthorTest')
+        cls.reader = User.objects.create(username='ReaderTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_user = Client()
+        self.quiet = Post.objects.create(text='Тихий пост', author=self.author)
+        self.busy = Post.objects.create(
+            text='Обсуждаемый пост', author=self.reader, group=self.group
+        )
+        for i in range(3):
+            Comment.objects.create(
+                post=self.busy, author=self.author, text=f'Ответ {i}'
+            )
+
+    def test_score_decays_with_age(self):
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.RANKING_HALF_LIFE)
+        self.assertAlmostEqual(
+            ranking.score(1, 0, now - half_life), ranking.score(0, 0, now)
+        )
+        self.assertGreater(
+            ranking.score(3, 0, now), ranking.score(0, 0, now)
+        )
+
+    def test_rank_updates_only_changed_posts(self):
+        self.assertEqual(ranking.rank(), (2, 0))
+        self.assertEqual(ranking.rank(), (0, 0))
+        Comment.objects.create(post=self.quiet, author=self.reader, text='Ок')
+        self.assertEqual(ranking.rank(), (1, 0))
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(ranking.rank(), (1, 0))
+        self.quiet.group = self.group
+        self.quiet.save()
+        self.assertEqual(ranking.rank(), (1, 0))
+        self.assertEqual(
+            PostScore.objects.get(pk=self.quiet.pk).group, self.group
+        )
+        self.assertEqual(ranking.rank(full=True), (2, 0))
+
+    def test_old_posts_leave_the_table(self):
+        ranking.rank()
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        self.assertEqual(ranking.rank(), (0, 1))
+        self.assertFalse(PostScore.objects.filter(pk=self.quiet.pk).exists())
+
+    def test_popular_pages_read_ranked_table(self):
+        call_command('rank_posts', stdout=StringIO())
+        response = self.guest_user.get(
+            reverse('posts:index'), {'sort': 'popular'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [self.busy, self.quiet]
+        )
+        response = self.guest_user.get(
+            reverse('posts:group_list', args=[self.group.slug]),
+            {'sort': 'popular'},
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.busy])
+        response = self.guest_user.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.busy, self.quiet]
+        )
+
+    @override_settings(RANKING_TOP_K=1)
+    def test_popular_page_is_top_k_and_refreshed_after_ranking(self):
+        url = reverse('posts:index')
+        ranking.rank()
+        response = self.guest_user.get(url, {'sort': 'popular'})
+        self.assertEqual(list(response.context['page_obj']), [self.busy])
+        for i in range(5):
+            Comment.objects.create(
+                post=self.quiet, author=self.reader, text=f'Ещё {i}'
+            )
+        ranking.rank()
+        response = self.guest_user.get(url, {'sort': 'popular'})
+        self.assertEqual(list(response.context['page_obj']), [self.quiet])
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+
+    def setUp(self):
+        self.guest_user = Client()
+        self.strong = Post.objects.create(
+            text='Ёжик в тумане. Ёжик ищет лошадку, ежик устал.',
+            author=self.user,
+        )
+        self.weak = Post.objects.create(
+            text='Про ежика и туман', author=self.user,
+        )
+        self.other = Post.objects.create(
+            text='Совсем другая история', author=self.user,
+        )
+
+    def check_backend(self):
+        found = list(search.search('ежик').order_by('-rank', '-pk'))
+        self.assertEqual(found, [self.strong])
+        self.assertEqual(
+            list(search.search('туман история')), []
+        )
+        self.strong.text = 'Теперь про историю'
+        self.strong.save()
+        self.assertEqual(list(search.search('ежик')), [])
+        self.assertEqual(list(search.search('историю')), [self.strong])
+        self.strong.delete()
+        self.assertEqual(list(search.search('историю')), [])
+
+    def test_fts5_backend(self):
+        self.assertTrue(search.fts_enabled())
+        self.check_backend()
+        # bm25 берётся из присоединённого индекса, без подзапроса
+        sql = str(search.search('ежик').query)
+        self.assertEqual(sql.count('MATCH'), 1)
+        self.assertNotIn('SELECT -bm25', sql)
+
+    def test_python_backend(self):
+        with mock.patch.object(search, '_fts_enabled', False):
+            for post in Post.objects.all():
+                search.index_post(post)
+            self.check_backend()
+
+    def test_search_view_ranks_and_pages_results(self):
+        for i in range(settings.PAGE_LIM - 1):
+            Post.objects.create(text=f'Туман номер {i}', author=self.user)
+        best = Post.objects.create(
+            text='Туман, туман и снова туман', author=self.user
+        )
+        url = reverse('posts:search')
+        response = self.guest_user.get(url, {'q': 'туман'})
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), settings.PAGE_LIM)
+        self.assertEqual(first_page[0], best)
+        self.assertContains(response, 'q=%D1%82%D1%83%D0%BC%D0%B0%D0%BD')
+        second_page = self.guest_user.get(
+            url, {'q': 'туман', 'cursor': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 1)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+
+    def test_admin_search_uses_index(self):
+        admin = site._registry[Post]
+        queryset, distinct = admin.get_search_results(
+            RequestFactory().get('/'), Post.objects.all(), 'история'
+        )
+        self.assertEqual(list(queryset), [self.other])
+        self.assertFalse(distinct)
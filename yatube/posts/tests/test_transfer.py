@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from .. import search, transfer
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.path = os.path.join(
+            self.temp_dir, f'{self._testMethodName}.ndjson'
+        )
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Старый пост про переезд', author=author, group=group
+        )
+        self.pub_date = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=self.pub_date)
+        Comment.objects.create(post=self.post, author=reader, text='Ок')
+        Follow.objects.create(user=reader, author=author)
+        call_command('posts_export', output=self.path, stderr=StringIO())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def import_file(self, **options):
+        out = StringIO()
+        call_command('posts_import', self.path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_export_writes_one_object_per_line(self):
+        with open(self.path, encoding='utf-8') as lines:
+            models = [json.loads(line)['model'] for line in lines]
+        self.assertEqual(models, ['group', 'post', 'comment', 'follow'])
+
+    def test_import_restores_rows_and_derived_data(self):
+        self.assertIn('строк/с', self.import_file())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.pub_date, self.pub_date)
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists()
+        )
+        self.assertEqual(list(search.search('переезд')), [post])
+
+    def test_import_is_idempotent(self):
+        self.import_file()
+        self.assertIn('новых объектов: 0', self.import_file())
+        self.assertEqual(Post.objects.get().comments_count, 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_import_resumes_from_checkpoint(self):
+        checkpoint = self.path + '.checkpoint'
+        with open(checkpoint, 'w') as file:
+            file.write('2')
+        output = self.import_file(batch_size=1)
+        self.assertIn('Продолжение со строки 3', output)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_import_fans_out_to_existing_followers(self):
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        self.import_file()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=reader, post_id=self.post.pk
+        ).exists())
+
+    def test_import_resets_sequences(self):
+        with mock.patch.object(
+            connection.ops, 'sequence_reset_sql', return_value=[]
+        ) as reset:
+            self.import_file()
+        models = [call.args[1] for call in reset.call_args_list]
+        self.assertIn((Post,), models)
+        self.assertIn((Comment,), models)
+        post = Post.objects.create(
+            text='Новый', author=User.objects.get(username='author')
+        )
+        self.assertGreater(post.pk, self.post.pk)
+
+    def test_post_with_taken_key_and_its_comments_are_skipped(self):
+        other = User.objects.create(username='other')
+        local = Post.objects.create(
+            pk=self.post.pk, text='Другой пост', author=other
+        )
+        with self.assertLogs('posts.transfer', 'WARNING'):
+            output = self.import_file()
+        self.assertIn('Пропущено строк с занятыми ключами постов: 2', output)
+        local.refresh_from_db()
+        self.assertEqual(local.text, 'Другой пост')
+        self.assertEqual(local.comments_count, 0)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_keep_dates_restores_fields_after_error(self):
+        field = Post._meta.get_field('pub_date')
+        with self.assertRaises(ValueError), transfer.keep_dates():
+            self.assertFalse(field.auto_now_add)
+            raise ValueError
+        self.assertTrue(field.auto_now_add)
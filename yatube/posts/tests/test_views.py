@@ -1,11 +1,13 @@
 from http import HTTPStatus
 
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+from ..utils import FORWARD, encode_cursor
 
 
 class PostPagesTests(TestCase):
@@ -102,15 +104,61 @@ class PostPagesTests(TestCase):
         self.assertTrue(post_text, 'Текст тестового поста')
 
     def test_cache_index(self):
-        post = Post.objects.create(
-            text='Тестовый пост',
-            author=self.user,
-        )
         response = self.authorized_user.get(reverse('posts:index'))
-        Post.objects.filter(pk=post.pk).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Изменён в обход')
         response_2 = self.authorized_user.get(reverse('posts:index'))
         self.assertEqual(response.content, response_2.content)
 
+    def test_cache_invalidated_on_changes(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            self.guest_user.get(url)
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.user,
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_user.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_user.get(url), post.text)
+
+    def test_post_detail_cache_invalidated_by_comment(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.guest_user.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий коммент'
+        )
+        self.assertContains(self.guest_user.get(url), 'Свежий коммент')
+
+    def test_post_detail_cache_invalidated_by_author_and_group(self):
+        author = User.objects.create(username='Renamed', first_name='Старое')
+        group = Group.objects.create(title='Старая группа', slug='old')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        url = reverse('posts:post_detail', args=[post.pk])
+        profile_url = reverse('posts:profile', args=[author.username])
+        self.guest_user.get(url)
+        self.guest_user.get(profile_url)
+        Post.objects.create(text='Ещё пост', author=author)
+        self.assertEqual(self.guest_user.get(url).context['posts_count'], 2)
+        author.first_name = 'Новое'
+        author.save()
+        self.assertContains(self.guest_user.get(url), 'Новое')
+        group.title = 'Новая группа'
+        group.save()
+        self.assertContains(self.guest_user.get(url), 'Новая группа')
+        author.username = 'RenamedAgain'
+        author.save()
+        response = self.guest_user.get(profile_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
     def test_404_page(self):
         response = self.guest_user.get('/OmG333/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -177,3 +225,178 @@ class PostPagesTests(TestCase):
         response = self.authorized_user.get(
             reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'])
+
+
+class PaginatorViewsTest(TestCase):
+    POSTS_COUNT = 13
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+            for i in range(cls.POSTS_COUNT)
+        )
+
+    def setUp(self):
+        self.guest_user = Client()
+        cache.clear()
+
+    def test_cursor_pages(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first_page = self.guest_user.get(url).context['page_obj']
+                self.assertEqual(len(first_page), settings.PAGE_LIM)
+                self.assertFalse(first_page.has_previous())
+                self.assertIsNone(first_page.paginator.count)
+                next_cursor = first_page.paginator.next_cursor
+                second_page = self.guest_user.get(
+                    url, {'cursor': next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), self.POSTS_COUNT - settings.PAGE_LIM
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(
+                    set(first_page.object_list)
+                    & set(second_page.object_list)
+                )
+                previous_page = self.guest_user.get(
+                    url, {'cursor': second_page.paginator.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    list(previous_page.object_list),
+                    list(first_page.object_list),
+                )
+
+    def test_numbered_pages_opt_in(self):
+        response = self.guest_user.get(reverse('posts:index'), {'page': 2})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(
+            len(page_obj), self.POSTS_COUNT - settings.PAGE_LIM
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.guest_user.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.PAGE_LIM
+        )
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        # n|1.5|3: число вместо даты публикации
+        cursor = encode_cursor(FORWARD, 1.5, 3)
+        response = self.guest_user.get(
+            reverse('posts:index'), {'cursor': cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Follower')
+        cls.author = User.objects.create(username='Author')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.user)
+
+    def test_follow_backfills_and_unfollow_prunes_feed(self):
+        self.authorized_user.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=self.old_post
+        ).exists())
+        self.authorized_user.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_pulled(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        response = self.authorized_user.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertIn(self.old_post, response.context['page_obj'])
+
+
+@override_settings(COMMENTS_PAGE_LIM=3)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserTest')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(5)
+        )
+
+    def setUp(self):
+        self.guest_user = Client()
+        cache.clear()
+
+    def test_post_detail_shows_newest_comments(self):
+        response = self.guest_user.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 4', 'Комментарий 3', 'Комментарий 2'],
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'Показать ещё')
+
+    def test_fragment_returns_next_page(self):
+        first_page = self.guest_user.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        with self.assertNumQueries(2):
+            response = self.guest_user.get(
+                url, {'cursor': first_page.paginator.next_cursor}
+            )
+        self.assertTemplateUsed(
+            response, 'posts/includes/comment_list.html'
+        )
+        self.assertNotContains(response, 'Тестовый пост')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 1', 'Комментарий 0'],
+        )
+        self.assertNotContains(response, 'Показать ещё')
+        response = self.guest_user.get(
+            reverse('posts:post_comments', args=[0])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,103 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Очередь — строки Thumbnail в статусе pending, без внешнего брокера.
+Сохранение поста с новой картинкой ставит в очередь все варианты:
+ширины POST_IMAGE_WIDTHS в каждом из форматов POST_IMAGE_FORMATS,
+которые умеет сохранять Pillow, а ``manage.py thumbnail_worker``
+разбирает её пулом потоков. Шаблоны только читают готовые адреса.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import base, get_thumbnail
+
+from . import cache
+from .models import Thumbnail
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_FORMAT = 'JPEG'
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+def supported_formats():
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE or image_format == FALLBACK_FORMAT
+    ]
+
+
+def register_formats():
+    """Учит sorl-thumbnail расширениям форматов, которых он не знает."""
+    for image_format in supported_formats():
+        base.EXTENSIONS.setdefault(image_format, image_format.lower())
+
+
+def variants():
+    for width in settings.POST_IMAGE_WIDTHS:
+        for image_format in supported_formats():
+            yield str(width), image_format
+
+
+def enqueue(post):
+    Thumbnail.objects.filter(post=post).delete()
+    if not post.image:
+        return
+    Thumbnail.objects.bulk_create(
+        Thumbnail(post=post, geometry=geometry, format=image_format)
+        for geometry, image_format in variants()
+    )
+
+
+def release_stale():
+    """Возвращает в очередь задачи упавших воркеров."""
+    deadline = timezone.now() - timedelta(
+        seconds=settings.THUMBNAIL_TASK_TIMEOUT
+    )
+    return Thumbnail.objects.filter(
+        status=Thumbnail.PROCESSING, updated__lt=deadline
+    ).update(status=Thumbnail.PENDING)
+
+
+def claim(limit):
+    candidates = Thumbnail.objects.filter(
+        status=Thumbnail.PENDING
+    ).order_by('updated').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if Thumbnail.objects.filter(
+            pk=pk, status=Thumbnail.PENDING
+        ).update(status=Thumbnail.PROCESSING, updated=timezone.now()):
+            claimed.append(pk)
+    return claimed
+
+
+def process(pk):
+    task = Thumbnail.objects.select_related(
+        'post__author', 'post__group'
+    ).get(pk=pk)
+    try:
+        image = get_thumbnail(
+            task.post.image,
+            task.geometry,
+            format=task.format,
+            quality=settings.POST_IMAGE_QUALITY,
+        )
+        task.url, task.width, task.height = (
+            image.url, image.width, image.height
+        )
+        task.status = Thumbnail.READY
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюру %s', task)
+        task.status = Thumbnail.FAILED
+    task.save(update_fields=('url', 'width', 'height', 'status', 'updated'))
+    cache.bump(*cache.post_scopes(task.post))
+    return task.status
@@ -0,0 +1,339 @@
+"""Потоковый перенос постов между окружениями в формате NDJSON.
+
+Каждая строка — один объект с полем model: group, post, comment или
+follow. Авторы и группы записываются по username и slug, ключи постов
+и комментариев сохраняются, как у loaddata. Экспорт читает таблицы
+через iterator(), импорт пишет их пачками bulk_create. Сигналы при
+этом не срабатывают, поэтому счётчики, ленты, поисковый индекс,
+очередь миниатюр и версии кэша обновляются здесь же, а счётчики
+автоинкремента сдвигаются за импортированные ключи.
+
+Если ключ поста уже занят другим постом (другой автор или дата), пост
+не загружается, а его комментарии пропускаются: по ключу они попали бы
+под чужой пост. Такие строки считаются в conflicts и пишутся в лог.
+"""
+import json
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, feed, search, thumbnails
+from .models import (Comment, Follow, Group, Post, Thumbnail, User,
+                     UserStats)
+
+logger = logging.getLogger(__name__)
+_dates_lock = threading.RLock()
+
+EXPORTS = {
+    'group': (
+        Group.objects.order_by('pk'),
+        {'slug': 'slug', 'title': 'title', 'description': 'description'},
+    ),
+    'post': (
+        Post.objects.order_by('pk'),
+        {
+            'pk': 'pk', 'text': 'text', 'pub_date': 'pub_date',
+            'author': 'author__username', 'group': 'group__slug',
+            'image': 'image', 'image_hash': 'image_hash',
+        },
+    ),
+    'comment': (
+        Comment.objects.order_by('pk'),
+        {
+            'pk': 'pk', 'post': 'post', 'author': 'author__username',
+            'text': 'text', 'created': 'created',
+            # По ним импорт проверяет, что ключ post — тот же пост
+            'post_author': 'post__author__username',
+            'post_date': 'post__pub_date',
+        },
+    ),
+    'follow': (
+        Follow.objects.order_by('pk'),
+        {'user': 'user__username', 'author': 'author__username'},
+    ),
+}
+
+
+def export_rows(chunk_size):
+    """Строки NDJSON: сначала группы, затем посты, комментарии и подписки.
+
+    Порядок важен для импорта: подписки идут последними, чтобы
+    заполнить ленты уже загруженными постами.
+    """
+    for model, (queryset, fields) in EXPORTS.items():
+        rows = queryset.values_list(*fields.values())
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = dict(zip(fields, row), model=model)
+            yield json.dumps(record, cls=DjangoJSONEncoder,
+                             ensure_ascii=False)
+
+
+def media_names():
+    return Post.objects.exclude(image='').values_list(
+        'image', flat=True
+    ).iterator(chunk_size=settings.TRANSFER_BATCH_SIZE)
+
+
+def copy_media(name, source, target):
+    """Копирует файл между хранилищами, если в целевом его ещё нет."""
+    if target.exists(name) or not source.exists(name):
+        return False
+    with source.open(name) as content:
+        target.save(name, content)
+    return True
+
+
+@contextmanager
+def keep_dates():
+    """Даёт bulk_create записать даты из файла, а не текущее время.
+
+    Флаг auto_now_add общий для процесса, поэтому блоки не пересекаются,
+    а исходные значения возвращаются и после ошибки.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    with _dates_lock:
+        saved = [field.auto_now_add for field in fields]
+        try:
+            for field in fields:
+                field.auto_now_add = False
+            yield
+        finally:
+            for field, auto_now_add in zip(fields, saved):
+                field.auto_now_add = auto_now_add
+
+
+def resolve_users(usernames):
+    """username -> pk; недостающие авторы создаются без пароля."""
+    usernames = set(usernames)
+    found = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'pk'))
+    missing = usernames - found.keys()
+    if missing:
+        User.objects.bulk_create(
+            User(username=username, password=make_password(None))
+            for username in missing
+        )
+        created = dict(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+        UserStats.objects.bulk_create(
+            UserStats(user_id=pk) for pk in created.values()
+        )
+        found.update(created)
+    return found
+
+
+def resolve_groups(slugs):
+    slugs = set(slugs) - {None}
+    return dict(Group.objects.filter(
+        slug__in=slugs
+    ).values_list('slug', 'pk'))
+
+
+def new_only(model, objects):
+    """Отбрасывает объекты, ключи которых уже заняты."""
+    existing = set(model.objects.filter(
+        pk__in=[obj.pk for obj in objects]
+    ).values_list('pk', flat=True))
+    return [obj for obj in objects if obj.pk not in existing]
+
+
+def post_identities(pks):
+    """pk -> (автор, дата публикации) постов, которые уже есть в базе."""
+    return {
+        pk: (author, pub_date) for pk, author, pub_date
+        in Post.objects.filter(pk__in=pks).values_list(
+            'pk', 'author__username', 'pub_date'
+        )
+    }
+
+
+def is_same_post(identity, author, pub_date):
+    """Совпадает ли пост в базе с постом из выгрузки.
+
+    DjangoJSONEncoder обрезает время до миллисекунд.
+    """
+    local_author, local_date = identity
+    return local_author == author and abs(
+        local_date - parse_datetime(pub_date)
+    ) < timedelta(milliseconds=1)
+
+
+def report_conflicts(model, pks):
+    if pks:
+        logger.warning(
+            'Пропущены строки %s: ключи постов заняты другими постами: %s',
+            model, ', '.join(map(str, sorted(pks))),
+        )
+
+
+def reset_sequences(*models):
+    """Сдвигает автоинкремент за ключи, записанные явно.
+
+    Иначе на PostgreSQL следующий обычный INSERT получит занятый ключ;
+    SQLite берёт следующий ключ из таблицы сам.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def import_groups(records):
+    slugs = resolve_groups(record['slug'] for record in records)
+    groups = [
+        Group(
+            slug=record['slug'], title=record['title'],
+            description=record['description'],
+        )
+        for record in records if record['slug'] not in slugs
+    ]
+    Group.objects.bulk_create(groups)
+    cache.bump(*(cache.group_scope(group.slug) for group in groups))
+    return Counter(created=len(groups))
+
+
+def import_posts(records):
+    authors = resolve_users(record['author'] for record in records)
+    groups = resolve_groups(record['group'] for record in records)
+    existing = post_identities([record['pk'] for record in records])
+    conflicts = {
+        record['pk'] for record in records
+        if record['pk'] in existing and not is_same_post(
+            existing[record['pk']], record['author'], record['pub_date']
+        )
+    }
+    report_conflicts('post', conflicts)
+    posts = [
+        Post(
+            pk=record['pk'], text=record['text'],
+            pub_date=parse_datetime(record['pub_date']),
+            author_id=authors[record['author']],
+            group_id=groups.get(record['group']),
+            image=record['image'], image_hash=record['image_hash'],
+        )
+        for record in records if record['pk'] not in existing
+    ]
+    Post.objects.bulk_create(posts)
+    reset_sequences(Post)
+    feed.fan_out_posts(posts)
+    Thumbnail.objects.bulk_create(
+        Thumbnail(post=post, geometry=geometry, format=image_format)
+        for post in posts if post.image
+        for geometry, image_format in thumbnails.variants()
+    )
+    for post in posts:
+        search.index_post(post)
+    for author, total in Counter(post.author_id for post in posts).items():
+        counters.change_user(author, posts_count=total)
+    cache.bump(
+        cache.feed_scope(),
+        *(cache.author_scope(username) for username in authors),
+        *(cache.group_scope(slug) for slug in groups),
+    )
+    return Counter(created=len(posts), conflicts=len(conflicts))
+
+
+def same_post(record, posts):
+    """Есть ли пост комментария и тот ли это пост, что в выгрузке."""
+    if record['post'] not in posts:
+        return False
+    if 'post_author' not in record:
+        # Выгрузка старого формата: сверить нечем
+        return True
+    return is_same_post(
+        posts[record['post']], record['post_author'], record['post_date']
+    )
+
+
+def import_comments(records):
+    authors = resolve_users(record['author'] for record in records)
+    posts = post_identities({record['post'] for record in records})
+    conflicts = {
+        record['pk'] for record in records
+        if record['post'] in posts and not same_post(record, posts)
+    }
+    report_conflicts('comment', conflicts)
+    records = [record for record in records if same_post(record, posts)]
+    comments = new_only(Comment, [
+        Comment(
+            pk=record['pk'], post_id=record['post'],
+            author_id=authors[record['author']], text=record['text'],
+            created=parse_datetime(record['created']),
+        )
+        for record in records
+    ])
+    Comment.objects.bulk_create(comments)
+    reset_sequences(Comment)
+    commented = Counter(comment.post_id for comment in comments)
+    for post, total in commented.items():
+        counters.change_comments(post, total)
+    cache.bump(*(cache.post_scope(post) for post in commented))
+    return Counter(created=len(comments), conflicts=len(conflicts))
+
+
+def import_follows(records):
+    users = resolve_users(
+        username for record in records
+        for username in (record['user'], record['author'])
+    )
+    pairs = {
+        (users[record['user']], users[record['author']])
+        for record in records if record['user'] != record['author']
+    }
+    existing = set(Follow.objects.filter(
+        user__in={user for user, _ in pairs},
+        author__in={author for _, author in pairs},
+    ).values_list('user', 'author'))
+    pairs -= existing
+    Follow.objects.bulk_create(
+        Follow(user_id=user, author_id=author) for user, author in pairs
+    )
+    following = defaultdict(list)
+    for user, author in pairs:
+        following[user].append(author)
+    for user, authors in following.items():
+        counters.change_user(user, following_count=len(authors))
+        feed.backfill(user, authors)
+    for author, total in Counter(author for _, author in pairs).items():
+        counters.change_user(author, followers_count=total)
+    cache.bump(*(cache.author_scope(username) for username in users))
+    return Counter(created=len(pairs))
+
+
+IMPORTERS = {
+    'group': import_groups,
+    'post': import_posts,
+    'comment': import_comments,
+    'follow': import_follows,
+}
+
+
+def import_batch(records):
+    """Загружает пачку строк.
+
+    Возвращает Counter: created — новых объектов, conflicts — строк,
+    пропущенных из-за ключей, занятых другими постами.
+    """
+    by_model = defaultdict(list)
+    for record in records:
+        by_model[record['model']].append(record)
+    totals = Counter()
+    for model, importer in IMPORTERS.items():
+        if by_model[model]:
+            totals += importer(by_model[model])
+    return totals
@@ -6,9 +6,15 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.post_search, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
@@ -16,6 +22,23 @@ urlpatterns = [
          name='add_comment',
          ),
     path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'follow/suggested/',
+        views.suggested_authors,
+        name='suggested_authors'
+    ),
+    path(
+        'profile/<str:username>/followers/',
+        views.follow_list,
+        {'relation': 'followers'},
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.follow_list,
+        {'relation': 'following'},
+        name='following'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
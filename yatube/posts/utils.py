@@ -1,9 +1,151 @@
+import base64
+import binascii
+from datetime import datetime
+
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+
+CURSOR_SEPARATOR = '|'
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, value, pk):
+    value = value.isoformat() if isinstance(value, datetime) else repr(value)
+    raw = CURSOR_SEPARATOR.join((direction, value, str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, key_field):
+    """Возвращает (направление, значение, pk) или None для битого курсора.
+
+    Значение разбирается полем ключа (key_field.to_python): курсор
+    с числом вместо даты — такой же битый, как и любой другой.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, value, pk = raw.decode().split(CURSOR_SEPARATOR)
+        value = key_field.to_python(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or value is None:
+        return None
+    return direction, value, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (field, tiebreaker) от новых записей к старым.
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница — это выборка
+    per_page + 1 строк после (или до) ключа из курсора.
+    Номер страницы условный: 1 — первая страница, 2 — любая другая,
+    этого достаточно для has_previous/has_next у обычного Page.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreaker='pk'):
+        super().__init__(object_list, per_page)
+        self.field = field
+        self.tiebreaker = tiebreaker
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_previous = False
+        self._has_next = False
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            tiebreaker = self.tiebreaker
+            if tiebreaker == 'pk' and 'pk' not in obj:
+                tiebreaker = 'id'
+            return obj[self.field], obj[tiebreaker]
+        return getattr(obj, self.field), getattr(obj, self.tiebreaker)
+
+    def _key_field(self):
+        """Поле модели или аннотации, по которому идёт пагинация."""
+        annotation = self.object_list.query.annotations.get(self.field)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(self.field)
+
+    def _seek(self, direction, value, pk):
+        lookup = 'lt' if direction == FORWARD else 'gt'
+        condition = (
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'{self.tiebreaker}__{lookup}': pk})
+        )
+        if direction == FORWARD:
+            ordering = (f'-{self.field}', f'-{self.tiebreaker}')
+        else:
+            ordering = (self.field, self.tiebreaker)
+        return self.object_list.filter(condition).order_by(*ordering)
+
+    def get_page(self, cursor):
+        position = None
+        if cursor:
+            position = decode_cursor(cursor, self._key_field())
+        if position is None:
+            queryset = self.object_list.order_by(
+                f'-{self.field}', f'-{self.tiebreaker}'
+            )
+            direction = FORWARD
+        else:
+            direction = position[0]
+            queryset = self._seek(*position)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == FORWARD:
+            self._has_previous = position is not None
+            self._has_next = has_more
+        else:
+            rows.reverse()
+            self._has_previous = has_more
+            self._has_next = True
+        if rows:
+            self.previous_cursor = encode_cursor(
+                BACKWARD, *self._key(rows[0])
+            ) if self._has_previous else None
+            self.next_cursor = encode_cursor(
+                FORWARD, *self._key(rows[-1])
+            ) if self._has_next else None
+        else:
+            self._has_previous = self._has_next = False
+        number = 2 if self._has_previous else 1
+        return self._get_page(rows, number, self)
+
+    page = get_page
+
+    @property
+    def count(self):
+        """Общее число объектов не считается: для курсора это лишний
+        COUNT(*) по всей ленте."""
+        return None
+
+    @property
+    def num_pages(self):
+        return (2 if self._has_previous else 1) + self._has_next
+
+    @property
+    def is_cursor(self):
+        return True
+
 
+def get_paginator(post_list, request, numbered=None, **cursor_options):
+    """Страница ленты: по курсору ?cursor=, нумерованная — по ?page=.
 
-def get_paginator(post_list, request):
-    paginator = Paginator(post_list, settings.PAGE_LIM)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    cursor_options (field, tiebreaker) задают ключ keyset-пагинации.
+    """
+    if numbered is None:
+        numbered = (
+            'page' in request.GET or not settings.FEED_CURSOR_PAGINATION
+        )
+    if numbered:
+        paginator = Paginator(post_list, settings.PAGE_LIM)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(
+        post_list, settings.PAGE_LIM, **cursor_options
+    )
+    return paginator.get_page(request.GET.get('cursor'))
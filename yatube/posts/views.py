@@ -1,36 +1,176 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import Max, OuterRef, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
+from core.db import write_transaction
+from core.routers import read_replica
+
+from . import cache, comment_queue, graph, ranking, search
+from .counters import stats_for
+from .feed import follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_paginator
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import CursorPaginator, get_paginator
+
+
+def is_popular(request):
+    return request.GET.get('sort') == 'popular'
+
+
+def ranking_scopes(request):
+    return (cache.ranking_scope(),) if is_popular(request) else ()
+
+
+def index_scopes(request):
+    return (cache.feed_scope(),) + ranking_scopes(request)
+
+
+def group_scopes(request, slug):
+    return (cache.group_scope(slug),) + ranking_scopes(request)
+
+
+def author_scopes(request, username, **kwargs):
+    return (cache.author_scope(username),)
+
+
+def post_meta(request, post_id):
+    """Автор, группа и даты поста одним запросом на весь запрос."""
+    meta = getattr(request, '_post_meta', None)
+    if meta is None or meta['pk'] != post_id:
+        commented = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        meta = Post.objects.filter(pk=post_id).annotate(
+            commented=Subquery(commented)
+        ).values(
+            'pk', 'author__username', 'group__slug', 'updated_at',
+            'commented',
+        ).first() or {'pk': post_id}
+        request._post_meta = meta
+    return meta
+
+
+def post_detail_scopes(request, post_id):
+    """Пост, его автор (имя, число постов) и группа (название)."""
+    meta = post_meta(request, post_id)
+    scopes = [cache.post_scope(post_id)]
+    if meta.get('author__username'):
+        scopes.append(cache.author_scope(meta['author__username']))
+    if meta.get('group__slug'):
+        scopes.append(cache.group_scope(meta['group__slug']))
+    return scopes
+
+
+def comments_scopes(request, post_id):
+    return (cache.post_scope(post_id),)
+
 
+def latest(*dates):
+    return max(filter(None, dates), default=None)
 
-@cache_page(20, key_prefix='index_page')
+
+def last_updated(scopes, **lookups):
+    """last_modified_func: последняя правка поста по фильтру или сброс
+    областей страницы — подписки, правки группы, удаления постов
+    updated_at не меняют."""
+    def last_modified(request, **kwargs):
+        filters = {
+            lookup: kwargs[name] for lookup, name in lookups.items()
+        }
+        edited = Post.objects.filter(**filters).aggregate(
+            last=Max('updated_at')
+        )['last']
+        return latest(edited, cache.last_changed(scopes(request, **kwargs)))
+    return last_modified
+
+
+def post_modified(request, post_id):
+    meta = post_meta(request, post_id)
+    return latest(
+        meta.get('updated_at'), meta.get('commented'),
+        cache.last_changed(post_detail_scopes(request, post_id)),
+    )
+
+
+def feed_page(request, posts, group=None):
+    """Страница ленты: новые посты или первые из популярной ленты."""
+    if is_popular(request):
+        popular = ranking.popular(group)
+        return Paginator(popular, settings.RANKING_TOP_K).get_page(1)
+    return get_paginator(posts, request)
+
+
+def comments_page(request, post_id):
+    """Страница комментариев от новых к старым по ?cursor=."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PAGE_LIM, field='created'
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@read_replica
+@cache.cache_feed(index_scopes)
 def index(request):
-    posts = Post.objects.select_related('group', 'author')
+    posts = Post.objects.for_feed()
     context = {
-        'page_obj': get_paginator(posts, request),
+        'page_obj': feed_page(request, posts),
+        'popular': is_popular(request),
     }
     return render(request, 'posts/index.html', context)
 
 
+@read_replica
+@condition(
+    etag_func=cache.etag(group_scopes, per_session=True),
+    last_modified_func=last_updated(group_scopes, group__slug='slug'),
+)
+@cache.cache_feed(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     context = {
         'group': group,
-        'page_obj': get_paginator(posts, request),
+        'page_obj': feed_page(request, posts, group),
+        'popular': is_popular(request),
         'posts': posts
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@read_replica
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search.search(query).for_feed()
+    context = {
+        'query': query,
+        'page_obj': get_paginator(
+            posts, request, numbered=False, field='rank'
+        ),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_replica
+@condition(
+    etag_func=cache.etag(author_scopes, per_session=True),
+    last_modified_func=last_updated(
+        author_scopes, author__username='username'
+    ),
+)
+@cache.cache_feed(author_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_count = posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.for_feed()
+    stats = stats_for(author)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
@@ -38,18 +178,31 @@ def profile(request, username):
     context = {
         'author': author,
         'posts': posts,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'page_obj': get_paginator(posts, request),
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@read_replica
+@condition(
+    etag_func=cache.etag(post_detail_scopes, per_session=True),
+    last_modified_func=post_modified,
+)
+@cache.cache_feed(post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts = Post.objects.all().filter(author=post.author)
-    posts_count = posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group')
+        .prefetch_related('thumbnails'),
+        pk=post_id
+    )
+    posts_count = stats_for(post.author).posts_count
+    comments = comments_page(request, post.pk)
+    pending = []
+    if request.user.is_authenticated and not comments.has_previous():
+        pending = cache.pending_comments(post.pk, request.user.pk)
     form = CommentForm(
         request.POST or None
     )
@@ -57,12 +210,28 @@ def post_detail(request, post_id):
         'post': post,
         'posts_count': posts_count,
         'comments': comments,
+        'pending_comments': pending,
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_replica
+@condition(etag_func=cache.etag(comments_scopes))
+@cache.cache_feed(comments_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML без поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@write_transaction()
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -104,22 +273,115 @@ def post_edit(request, post_id):
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+    if form.is_valid() and settings.COMMENT_QUEUE_ENABLED:
+        comment_queue.enqueue(
+            post.pk, request.user.pk, form.cleaned_data['text']
+        )
+    elif form.is_valid():
+        with write_transaction():
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def follow_ids(author, relation):
+    """Подписчики (followers) или подписки (following) автора."""
+    follow_graph = graph.get_graph()
+    if follow_graph is not None:
+        return getattr(follow_graph, relation)(author.pk)
+    if relation == 'followers':
+        follows = Follow.objects.filter(author=author)
+        return follows.order_by('user_id').values_list('user_id', flat=True)
+    follows = Follow.objects.filter(user=author)
+    return follows.order_by('author_id').values_list('author_id', flat=True)
+
+
+def mutual_ids(author, ids):
+    """Кто из ids подписан на автора и на кого подписан он сам."""
+    follow_graph = graph.get_graph()
+    if follow_graph is not None:
+        return {
+            pk for pk in ids
+            if follow_graph.follows(pk, author.pk)
+            and follow_graph.follows(author.pk, pk)
+        }
+    followers = Follow.objects.filter(author=author, user_id__in=ids)
+    following = Follow.objects.filter(user=author, author_id__in=ids)
+    return set(followers.values_list('user_id', flat=True)) & set(
+        following.values_list('author_id', flat=True)
+    )
+
+
+def users_by_ids(ids):
+    users = User.objects.in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
+
+
+author_etag = cache.etag(author_scopes, per_session=True)
+
+
+def follow_list_etag(request, **kwargs):
+    """Граф у каждого воркера свой и может отставать: ETag меняется
+    и с версией автора, и с перестройкой графа."""
+    graph.get_graph()
+    return f'{author_etag(request, **kwargs)}.{graph.generation()}'
+
+
+@read_replica
+@condition(etag_func=follow_list_etag)
+def follow_list(request, username, relation):
+    author = get_object_or_404(User, username=username)
+    page_obj = Paginator(
+        follow_ids(author, relation), settings.PAGE_LIM
+    ).get_page(request.GET.get('page'))
+    ids = list(page_obj.object_list)
+    context = {
+        'author': author,
+        'relation': relation,
+        'page_obj': page_obj,
+        'users': users_by_ids(ids),
+        'mutual': mutual_ids(author, ids),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@login_required
+@read_replica
+def suggested_authors(request):
+    """Авторы, на которых подписаны авторы пользователя.
+
+    Без графа или без подписок — самые популярные авторы.
+    """
+    follow_graph = graph.get_graph()
+    ids = []
+    if follow_graph is not None:
+        ids = follow_graph.suggested(
+            request.user.pk, settings.FOLLOW_SUGGESTIONS
+        )
+    if not ids:
+        ids = list(
+            UserStats.objects.exclude(user=request.user)
+            .exclude(user__following__user=request.user)
+            .order_by('-followers_count')
+            .values_list('user_id', flat=True)[:settings.FOLLOW_SUGGESTIONS]
+        )
+    context = {
+        'relation': 'suggested',
+        'suggested': True,
+        'users': users_by_ids(ids),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
 @login_required
+@read_replica
 def follow_index(request):
-    post = (
-        Post.objects
-        .select_related('author')
-        .filter(author__following__user=request.user)
+    posts = follow_feed(request.user).for_feed()
+    page_obj = get_paginator(
+        posts, request, field='feed_date', tiebreaker='feed_post'
     )
-    page_obj = get_paginator(post, request)
     context = {
         'page_obj': page_obj
     }
@@ -127,6 +389,7 @@ def follow_index(request):
 
 
 @login_required
+@write_transaction()
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -135,6 +398,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@write_transaction()
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
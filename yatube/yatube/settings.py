@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.caches import LOCAL_CACHE_MAX_TIMEOUT, cache_settings, is_shared
+from core.db import database_settings, env_int
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -37,6 +40,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'core.apps.CoreConfig',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -50,11 +54,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,12 +68,26 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Кэшировать разобранные шаблоны в памяти процесса. Явный список loaders
+# отключает кэш, который Django включает сам при DEBUG = False, поэтому
+# по умолчанию он следует DEBUG
+TEMPLATES_CACHED = bool(env_int('TEMPLATES_CACHED', int(not DEBUG)))
+# Разбирать все шаблоны при старте воркера, если включён кэш
+TEMPLATES_WARMUP = True
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATES_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,13 +104,39 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+# Переменные окружения DB_ENGINE, DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST, DB_PORT, DB_CONN_MAX_AGE и DB_REPLICAS, см. core/db.py.
+# Реплики для чтения лент: алиас из DATABASES -> вес при выборе
+DATABASES, DATABASE_REPLICAS = database_settings(BASE_DIR)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Проверять постоянные соединения перед каждым запросом
+DB_CONN_HEALTH_CHECKS = True
+
+# Выставляются каждому новому соединению SQLite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': env_int('DB_BUSY_TIMEOUT', 5000),
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
 }
 
+# Транзакции SQLite сразу берут блокировку на запись
+SQLITE_BEGIN_IMMEDIATE = True
+
+# Сколько секунд после записи пользователь читает из основной базы
+READ_YOUR_WRITES_SECONDS = 10
+# Насколько отстают реплики: страницу, чьи данные менялись недавно,
+# собирают из основной базы, иначе старая копия ляжет в кэш
+REPLICA_LAG_SECONDS = READ_YOUR_WRITES_SECONDS
+
+# Переменные окружения CACHE_BACKEND и CACHE_LOCATION, см. core/caches.py.
+# Версии лент и блокировки должны быть общими для всех процессов
+CACHES = cache_settings()
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +184,94 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 PAGE_LIM = 10
 
+# Комментарии под постом подгружаются страницами по курсору
+COMMENTS_PAGE_LIM = 20
+
+# Наибольший ?limit= для списков API
+API_MAX_PAGE_SIZE = 100
+
+# Сколько имён принимает массовая подписка /api/v1/follows/bulk/
+API_MAX_BULK_FOLLOWS = 1000
+
+# Keyset-пагинация лент по ?cursor=; нумерованные страницы — по ?page=
+FEED_CURSOR_PAGINATION = True
+
+# Лента подписок: авторы с большим числом подписчиков читаются через pull
+FEED_FANOUT_LIMIT = 5000
+
+FEED_BACKFILL_LIMIT = 1000
+
+FEED_BATCH_SIZE = 500
+
+# Страницы лент сбрасываются сигналами, таймаут лишь вытесняет старые версии.
+# Кэш в памяти процесса не видит сбросов из других процессов
+FEED_CACHE_TIMEOUT = (
+    60 * 60 * 6 if is_shared(CACHES) else LOCAL_CACHE_MAX_TIMEOUT
+)
+
+# Сколько ещё отдавать просроченную страницу, пока её пересчитывает один воркер
+FEED_CACHE_STALE_TIMEOUT = 60
+
+FEED_CACHE_LOCK_TIMEOUT = 10
+
+FEED_CACHE_POLL_INTERVAL = 0.05
+
+# > 0 включает вероятностный пересчёт до истечения срока (XFetch)
+FEED_CACHE_EARLY_BETA = 1.0
+
+# Карточки постов в лентах кэшируются отдельно, ключ меняется с правкой
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Популярная лента (manage.py rank_posts): вес поста вдвое падает
+# за RANKING_HALF_LIFE секунд, старше RANKING_WINDOW посты не ранжируются
+RANKING_HALF_LIFE = 60 * 60 * 12
+
+RANKING_WINDOW = 60 * 60 * 24 * 7
+
+RANKING_COMMENT_WEIGHT = 1.0
+
+RANKING_FOLLOWER_WEIGHT = 0.1
+
+# Сколько постов читает страница популярной ленты
+RANKING_TOP_K = 50
+
+RANKING_BATCH_SIZE = 500
+
+RANKING_INTERVAL = 60
+
+# Отложенная запись комментариев: add_comment пишет в файл очереди,
+# в базу их переносит manage.py flush_comments. Нужен общий кэш (CACHES)
+COMMENT_QUEUE_ENABLED = False
+
+COMMENT_QUEUE_DIR = os.path.join(BASE_DIR, 'comment_queue')
+
+COMMENT_QUEUE_FSYNC = True
+
+COMMENT_QUEUE_BATCH_SIZE = 400
+
+COMMENT_QUEUE_INTERVAL = 1.0
+
+# Сколько автор видит свой комментарий из очереди, если flush_comments стоит
+COMMENT_PENDING_TIMEOUT = 60 * 10
+
+# Граф подписок в памяти процесса (posts.graph): 8 байт на подписку плюс
+# массивы каждого пользователя, около 330 МБ на 10 млн подписок
+# и 1 млн пользователей (manage.py benchmark_follow_graph)
+FOLLOW_GRAPH_SHARDS = 64
+
+# Больше подписок граф не строит, страницы читают их из базы
+FOLLOW_GRAPH_MAX_EDGES = 20 * 10 ** 6
+
+# Через сколько секунд граф перестраивается, чтобы увидеть подписки,
+# сделанные в других процессах
+FOLLOW_GRAPH_REFRESH = 60 * 5
+
+FOLLOW_GRAPH_BATCH_SIZE = 10000
+
+FOLLOW_GRAPH_SUGGEST_SCAN = 200
+
+FOLLOW_SUGGESTIONS = 20
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -146,3 +280,47 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки больше этого размера Django сразу пишет во временный файл
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
+POST_IMAGE_MAX_SIDE = 2560
+
+POST_IMAGE_UPLOAD_QUALITY = 85
+
+# Варианты картинок для srcset, которые готовит manage.py thumbnail_worker.
+# Форматы, которые не умеет сохранять Pillow, пропускаются; JPEG — запасной
+POST_IMAGE_WIDTHS = (320, 640, 1000)
+
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+
+POST_IMAGE_QUALITY = 80
+
+POST_IMAGE_SIZES = '(max-width: 768px) 100vw, 75vw'
+
+THUMBNAIL_WORKERS = 4
+
+THUMBNAIL_BATCH_SIZE = 32
+
+# Через сколько секунд задачу упавшего воркера можно взять снова
+THUMBNAIL_TASK_TIMEOUT = 300
+
+# Строк NDJSON в одной транзакции posts_import и в одной выборке
+# posts_export
+TRANSFER_BATCH_SIZE = 1000
+
+TRANSFER_MEDIA_WORKERS = 8
+
+# Замеры запросов: заголовок Server-Timing, гистограмма на /core/profiling/
+# и лог core.profiling
+PROFILING_ENABLED = False
+
+# Доля запросов, которые пишутся в лог
+PROFILING_SAMPLE_RATE = 0.01
+
+# Верхние границы корзин гистограммы задержек, мс
+PROFILING_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
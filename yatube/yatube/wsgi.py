@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Разбирает шаблоны и строит граф подписок до первого запроса к воркеру
+from core.templating import warm_up  # noqa: E402
+from posts import graph  # noqa: E402
+
+warm_up()
+graph.preload()